@@ -0,0 +1,71 @@
+#!/usr/bin/env python
+
+# Measures how long it takes to bring up a pytest session, once with an empty compilation cache and then with the cache it left behind. Every run writes the per phase breakdown from --setupTimingsFile, so changes to the test harness can be compared phase by phase.
+
+from json import dump as json_dump, load as json_load
+from os import path, environ, listdir
+from shutil import rmtree
+from subprocess import call
+from tempfile import mkdtemp
+from time import time
+
+import argparse
+import sys
+
+BASE_PATH = path.dirname(path.abspath(__file__))
+def resolveRelativePath(relativeFilePath):
+    return path.abspath(path.join(BASE_PATH, relativeFilePath))
+
+def runSession(test, cacheDirectory, timingsPath):
+    environment = dict(environ)
+    environment['COMPILATION_CACHE_ROOT'] = cacheDirectory
+    startTime = time()
+    exitCode = call([sys.executable, '-m', 'pytest', '-q', test, '--setupTimingsFile', timingsPath], cwd=resolveRelativePath('../..'), env=environment)
+    wallSeconds = time() - startTime
+    if exitCode != 0:
+        raise Exception("pytest exited with %d while running %s" % (exitCode, test))
+    with open(timingsPath, 'r') as file:
+        timings = json_load(file)
+    timings['wallSeconds'] = wallSeconds
+    return timings
+
+def formatRun(name, timings):
+    lines = ['%s: %.2fs wall, %.2fs until the first test started' % (name, timings['wallSeconds'], timings['startupSeconds'])]
+    # only the outermost phases, the nested ones are in the JSON output
+    for phase in timings['phases']:
+        if '/' in phase['phase']: continue
+        lines.append('  %10.3f %6d  %s' % (phase['seconds'], phase['count'], phase['phase']))
+    return lines
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-t", "--test", help="The test to run in every session. Pick one that needs the snapshots you care about.", default="tests/test_controller.py::test_whitelists")
+    parser.add_argument("-r", "--runs", help="How many warm cache sessions to run after the cold one", type=int, default=3)
+    parser.add_argument("-o", "--output", help="Write the timings of every run to this JSON file")
+    parser.add_argument("-c", "--cacheDirectory", help="Use this directory as the cold cache instead of a temporary one. It must be empty or missing.")
+    input_args = parser.parse_args()
+
+    if input_args.cacheDirectory and path.isdir(input_args.cacheDirectory) and listdir(input_args.cacheDirectory):
+        raise Exception("%s isn't empty, so the first session wouldn't start with a cold cache" % input_args.cacheDirectory)
+    cacheDirectory = input_args.cacheDirectory or mkdtemp(prefix='augur-compilation-cache-')
+    timingsPath = path.join(mkdtemp(prefix='augur-startup-timings-'), 'timings.json')
+    try:
+        runs = [('cold', runSession(input_args.test, cacheDirectory, timingsPath))]
+        for run in range(input_args.runs):
+            runs.append(('warm %d' % (run + 1), runSession(input_args.test, cacheDirectory, timingsPath)))
+    finally:
+        if not input_args.cacheDirectory:
+            rmtree(cacheDirectory, ignore_errors=True)
+        rmtree(path.dirname(timingsPath), ignore_errors=True)
+
+    for name, timings in runs:
+        print '\n'.join(formatRun(name, timings))
+    warmRuns = [timings['startupSeconds'] for name, timings in runs[1:]]
+    if warmRuns:
+        print 'cold startup: %.2fs, best warm startup: %.2fs' % (runs[0][1]['startupSeconds'], min(warmRuns))
+    if input_args.output:
+        with open(input_args.output, 'w') as file:
+            json_dump([dict(timings, run=name) for name, timings in runs], file, indent=2, sort_keys=True)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,29 @@
+const fs = require('fs');
+
+const LENGTH_PREFIX_SIZE = 4;
+
+// Streams the event log written by tests/event_log.py, where every record is a 4 byte big endian length followed by the event as JSON. Calls onEvent with the JSON of each event and resolves once the whole file was read, so only one chunk of the file is ever held in memory.
+function readEventLog(logPath, onEvent) {
+    return new Promise((resolve, reject) => {
+        const stream = fs.createReadStream(logPath);
+        let pending = Buffer.alloc(0);
+        stream.on('data', chunk => {
+            pending = pending.length ? Buffer.concat([pending, chunk]) : chunk;
+            let offset = 0;
+            while (pending.length - offset >= LENGTH_PREFIX_SIZE) {
+                const length = pending.readUInt32BE(offset);
+                if (pending.length - offset - LENGTH_PREFIX_SIZE < length) break;
+                onEvent(pending.toString('utf8', offset + LENGTH_PREFIX_SIZE, offset + LENGTH_PREFIX_SIZE + length));
+                offset += LENGTH_PREFIX_SIZE + length;
+            }
+            pending = pending.slice(offset);
+        });
+        stream.on('error', reject);
+        stream.on('end', () => {
+            if (pending.length) return reject(new Error(`${logPath} ends in the middle of a record`));
+            resolve();
+        });
+    });
+}
+
+module.exports = { readEventLog };
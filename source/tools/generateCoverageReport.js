@@ -1,7 +1,5 @@
 #!/usr/bin/env node
 
-// NOTE: Make sure to run with --max-old-space-size=12288. We're loading a massive file into memory during report generation
-
 const App = require('solidity-coverage/lib/app.js');
 const death = require('death');
 const { execSync } = require('child_process');
@@ -9,6 +7,10 @@ const copydir = require('copy-dir');
 const replace = require("replace");
 const rimraf = require('rimraf');
 const fs = require('fs');
+const { readEventLog } = require('./eventLogReader');
+
+// Written by the tests in --cover mode, see tests/event_log.py
+const EVENT_LOG_PATH = './allFiredEvents.bin';
 
 const config = {
     dir: './source',
@@ -43,10 +45,15 @@ try {
     console.log(err);
 }
 
-app.generateReport();
-
-// Cleanup
-rimraf.sync('./allFiredEvents');
-rimraf.sync('./scTopics');
-rimraf.sync('./coverage.json');
-rimraf.sync('./tests/compilation_cache')
+// solidity-coverage would read every event into memory before counting them, so the events are streamed into its coverage map one at a time and it gets an empty event file to read
+readEventLog(EVENT_LOG_PATH, event => app.coverage.generate([event], `${app.workingDir}/contracts`)).then(() => {
+    fs.writeFileSync('./allFiredEvents', '');
+    app.generateReport();
+
+    // Cleanup
+    rimraf.sync('./allFiredEvents');
+    rimraf.sync(EVENT_LOG_PATH);
+    rimraf.sync('./scTopics');
+    rimraf.sync('./coverage.json');
+    rimraf.sync('./tests/compilation_cache')
+}).catch(err => app.cleanUp(err));
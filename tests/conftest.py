@@ -3,21 +3,38 @@ from datetime import timedelta
 from ethereum.state import State
 from ethereum.tools import tester
 from ethereum.tools.tester import Chain
-from ethereum.abi import ContractTranslator
+from ethereum.abi import ContractTranslator, method_id
 from ethereum.tools.tester import ABIContract
 from ethereum.config import config_metropolis, Env
 from ethereum import utils
 from ethereum import vm
 import ethereum
-from io import open as io_open
+from multiprocessing import Pool, cpu_count
 from json import dump as json_dump, load as json_load, dumps as json_dumps
-from os import path, walk, makedirs, listdir, remove as remove_file
+from os import path, walk, makedirs, listdir, environ, rename, getpid, remove as remove_file
+from cPickle import dump as pickle_dump, load as pickle_load, HIGHEST_PROTOCOL
+from hashlib import sha256
+from subprocess import call, check_output, CalledProcessError
+from fcntl import flock, LOCK_EX, LOCK_UN
 import pytest
-from re import findall
-from solc import compile_standard
+from solc import compile_standard, get_solc_version
 from utils import bytesToHexString, bytesToLong, longToHexString, stringToBytes, garbageBytes20, garbageBytes32, twentyZeros, thirtyTwoZeros
 from copy import deepcopy
+from collections import MutableMapping
 from reporting_utils import proceedToFork, finalizeFork
+from scenarios import scenarios, bindContracts
+from import_graph import ImportGraph
+from gas_benchmark import GasBaseline
+from source_profiler import SourceProfiler
+from storage_profiler import StorageProfiler
+from storage_layout import createStorageLayout
+from session_timer import SessionTimer
+from event_bus import EventBus, registerEvents
+from event_log import EventLogWriter
+from contract_size import ContractSizeHistory, ContractSizeReport, createFunctionRanges
+from snapshot_store import SnapshotStore
+from duration_scheduler import DurationHistory, groupModules, orderModules, partitionModules, hashModules, parseShard
+from time import time
 
 # Make TXs free.
 ethereum.opcodes.GCONTRACTBYTE = 0
@@ -43,7 +60,202 @@ ethereum.messages.create_contract = new_create_contract
 BASE_PATH = path.dirname(path.abspath(__file__))
 def resolveRelativePath(relativeFilePath):
     return path.abspath(path.join(BASE_PATH, relativeFilePath))
-COMPILATION_CACHE = resolveRelativePath('./compilation_cache')
+REPOSITORY_ROOT = resolveRelativePath('..')
+# The cache is content addressed so it can be shared between checkouts, branches and CI runners by pointing this at a common directory
+COMPILATION_CACHE = environ.get('COMPILATION_CACHE_ROOT', resolveRelativePath('./compilation_cache'))
+# Every event fired in a coverage run, read back by source/tools/generateCoverageReport.js
+EVENT_LOG_PATH = './allFiredEvents.bin'
+
+# Bump this whenever the contents of an artifact record change so stale records are never read
+ARTIFACT_FORMAT_VERSION = 5
+OPTIMIZER_SETTINGS = {
+    'enabled': True,
+    'runs': 200
+}
+OUTPUT_SELECTION = [ 'metadata', 'evm.bytecode.object', 'evm.bytecode.sourceMap', 'evm.deployedBytecode.object', 'evm.deployedBytecode.sourceMap', 'abi' ]
+SOURCE_OUTPUT_SELECTION = [ 'ast' ]
+
+# The session snapshots, each built on top of the one before it
+SESSION_SNAPSHOTS = [ 'baseSnapshot', 'controllerSnapshot', 'augurInitializedSnapshot', 'augurInitializedWithMocksSnapshot', 'kitchenSinkSnapshot' ]
+
+# Collects how long each phase of bringing up the session takes, see --setupTimings
+sessionTimer = SessionTimer()
+
+def getRemappings(relativeContractsPath, relativeTestContractsPath):
+    # TODO: Remove remappings and update 'sources' in the compiler parameter instead
+    return [ '=%s/' % resolveRelativePath(relativeContractsPath), 'TEST=%s/' % resolveRelativePath(relativeTestContractsPath) ]
+
+solcVersion = None
+def getSolcVersion():
+    global solcVersion
+    if not solcVersion:
+        solcVersion = str(get_solc_version())
+    return solcVersion
+
+def getCacheKey(filePath, sourceHashes, relativeContractsPath, relativeTestContractsPath):
+    # Paths are made relative to the repository root so identical inputs produce identical keys in any checkout
+    relativeRemappings = [ remapping.replace(REPOSITORY_ROOT, '') for remapping in getRemappings(relativeContractsPath, relativeTestContractsPath) ]
+    keyInputs = {
+        'artifactFormatVersion': ARTIFACT_FORMAT_VERSION,
+        'contract': path.relpath(filePath, REPOSITORY_ROOT),
+        'sources': sorted([ path.relpath(dependencyPath, REPOSITORY_ROOT), sourceHash ] for dependencyPath, sourceHash in sourceHashes.items()),
+        'solcVersion': getSolcVersion(),
+        'remappings': relativeRemappings,
+        'optimizer': OPTIMIZER_SETTINGS,
+        'outputSelection': OUTPUT_SELECTION,
+        'sourceOutputSelection': SOURCE_OUTPUT_SELECTION,
+    }
+    return sha256(json_dumps(keyInputs, sort_keys=True)).hexdigest()
+
+def compileSolidity(absoluteFilePath, relativeContractsPath, relativeTestContractsPath):
+    filename = path.basename(absoluteFilePath)
+    contractName = path.splitext(filename)[0]
+    compilerParameter = {
+        'language': 'Solidity',
+        'sources': {
+            absoluteFilePath: {
+                'urls': [ absoluteFilePath ]
+            }
+        },
+        'settings': {
+            'remappings': getRemappings(relativeContractsPath, relativeTestContractsPath),
+            'optimizer': OPTIMIZER_SETTINGS,
+            'outputSelection': {
+                "*": {
+                    '': SOURCE_OUTPUT_SELECTION,
+                    '*': OUTPUT_SELECTION
+                }
+            }
+        }
+    }
+    compilerOutput = compile_standard(compilerParameter, allow_paths=resolveRelativePath("../"))
+    compiledContract = compilerOutput['contracts'][absoluteFilePath][contractName]
+    # Source maps refer to files by their index in the compiler's source list
+    sourcePaths = sorted(compilerOutput['sources'], key=lambda sourcePath: compilerOutput['sources'][sourcePath]['id'])
+    compiledContract['sourceList'] = [ path.relpath(sourcePath, REPOSITORY_ROOT) for sourcePath in sourcePaths ]
+    sourceAsts = [ compilerOutput['sources'][sourcePath]['ast'] for sourcePath in sourcePaths ]
+    compiledContract['storageLayout'] = createStorageLayout(sourceAsts, contractName)
+    compiledContract['functionRanges'] = createFunctionRanges(sourceAsts)
+    return compiledContract
+
+# A single compile produces everything we need from a contract, so it is all kept together in one artifact record
+def createArtifact(compiledContract):
+    return {
+        'bytecode': compiledContract['evm']['bytecode']['object'],
+        'sourceMap': compiledContract['evm']['bytecode']['sourceMap'],
+        'deployedBytecode': compiledContract['evm']['deployedBytecode']['object'],
+        'deployedSourceMap': compiledContract['evm']['deployedBytecode']['sourceMap'],
+        'sourceList': compiledContract['sourceList'],
+        'storageLayout': compiledContract['storageLayout'],
+        'functionRanges': compiledContract['functionRanges'],
+        'abi': compiledContract['abi'],
+        'metadata': compiledContract['metadata'],
+    }
+
+def writeArtifact(artifactPath, artifact):
+    # Write to a temporary file and rename it into place so other processes sharing the cache never read a partial artifact
+    temporaryPath = '%s.%d' % (artifactPath, getpid())
+    with open(temporaryPath, mode='w') as file:
+        json_dump(artifact, file)
+    rename(temporaryPath, artifactPath)
+
+# Opcodes whose result depends on where, when or by whom a contract is deployed. A constructor that uses none of them leaves the same code and storage behind every time the same sender deploys it without arguments. CALLER is fine because templates are keyed by sender and CALLVALUE is fine because uploads never send value.
+CONTEXT_DEPENDENT_OPCODES = set([0x30, 0x31, 0x32, 0x3a, 0x3b, 0x3c, 0x40, 0x41, 0x42, 0x43, 0x44, 0x45, 0xa0, 0xa1, 0xa2, 0xa3, 0xa4, 0xf0, 0xf1, 0xf2, 0xf4, 0xfa, 0xff])
+PUSH1 = 0x60
+PUSH32 = 0x7f
+
+def hasContextIndependentConstructor(artifact):
+    bytecode = bytearray.fromhex(artifact['bytecode'])
+    deployedBytecode = bytearray.fromhex(artifact['deployedBytecode'])
+    # solc appends the runtime code to the constructor code, anything else we don't understand well enough to skip
+    if not deployedBytecode or not bytecode.endswith(deployedBytecode): return False
+    constructorCode = bytecode[:len(bytecode) - len(deployedBytecode)]
+    programCounter = 0
+    while programCounter < len(constructorCode):
+        opcode = constructorCode[programCounter]
+        if opcode in CONTEXT_DEPENDENT_OPCODES: return False
+        if PUSH1 <= opcode <= PUSH32:
+            programCounter += opcode - PUSH1 + 1
+        programCounter += 1
+    return True
+
+class CacheLock():
+
+    def __init__(self, name):
+        self.lockPath = path.join(COMPILATION_CACHE, name + '.lock')
+
+    def __enter__(self):
+        ContractsFixture.ensureCacheDirectoryExists()
+        self.lockFile = open(self.lockPath, 'w')
+        flock(self.lockFile, LOCK_EX)
+
+    def __exit__(self, *args):
+        flock(self.lockFile, LOCK_UN)
+        self.lockFile.close()
+
+def isXdistWorker(config):
+    return hasattr(config, 'slaveinput') or hasattr(config, 'workerinput')
+
+def isXdistCoordinator(config):
+    return not isXdistWorker(config) and bool(getattr(config.option, 'numprocesses', None))
+
+# Runs inside a worker process of the compile pool, so it has to be a module level function. Errors are returned rather than raised because solc's exceptions don't survive being pickled back to the parent.
+def compileSolidityInWorker(compileJob):
+    absoluteFilePath, relativeContractsPath, relativeTestContractsPath = compileJob
+    name = path.splitext(path.basename(absoluteFilePath))[0]
+    print('compiling ' + name + '...')
+    startTime = time()
+    try:
+        compiledContract = compileSolidity(absoluteFilePath, relativeContractsPath, relativeTestContractsPath)
+    except Exception as exception:
+        return (absoluteFilePath, None, str(exception), time() - startTime)
+    return (absoluteFilePath, createArtifact(compiledContract), None, time() - startTime)
+
+# Resetting to a snapshot would otherwise wrap all ~60 deployed contracts in ABIContracts even though most tests only touch a few of them. This keeps the dict API tests use but only binds a contract to the chain the first time it is looked up.
+class LazyContracts(MutableMapping):
+
+    def __init__(self, chain, snapshotContracts):
+        self.chain = chain
+        self.unboundContracts = dict(snapshotContracts)
+        self.boundContracts = {}
+
+    def __getitem__(self, name):
+        if name not in self.boundContracts:
+            contract = self.unboundContracts.pop(name)
+            self.boundContracts[name] = ABIContract(self.chain, contract['translator'], contract['address'])
+        return self.boundContracts[name]
+
+    def __setitem__(self, name, contract):
+        self.unboundContracts.pop(name, None)
+        self.boundContracts[name] = contract
+
+    def __delitem__(self, name):
+        if name in self.boundContracts:
+            del self.boundContracts[name]
+        else:
+            del self.unboundContracts[name]
+
+    def __contains__(self, name):
+        return name in self.boundContracts or name in self.unboundContracts
+
+    def __iter__(self):
+        for name in self.boundContracts.keys() + self.unboundContracts.keys():
+            yield name
+
+    def __len__(self):
+        return len(self.boundContracts) + len(self.unboundContracts)
+
+    def toSnapshot(self):
+        contractsCopy = dict(self.unboundContracts)
+        for name, contract in self.boundContracts.items():
+            contractsCopy[name] = dict(translator = contract.translator, address = contract.address)
+        return contractsCopy
+
+class PersistedContract():
+
+    def __init__(self, translator, address):
+        self.translator = translator
+        self.address = address
 
 class bcolors:
     WARN = '\033[93m'
@@ -56,15 +268,221 @@ CONTRACT_SIZE_WARN_LEVEL = CONTRACT_SIZE_LIMIT * 0.75
 def pytest_addoption(parser):
     parser.addoption("--cover", action="store_true", help="Use the coverage enabled contracts. Meant to be used with the tools/generateCoverageReport.js script")
     parser.addoption("--subFork", action="store_true", help="Use the coverage enabled contracts. Meant to be used with the tools/generateCoverageReport.js script")
+    parser.addoption("--profileGas", action="store_true", help="Print a call tree of gas usage for every PrintGasUsed block")
+    parser.addoption("--gasProfileDir", action="store", default=None, help="With --profileGas, also write a collapsed stack file per PrintGasUsed block to this directory for flame graphs")
+    parser.addoption("--freshSnapshots", action="store_true", help="Build the session snapshots from scratch instead of loading them from the compilation cache")
+    parser.addoption("--gasBench", action="store_true", help="Run the gas benchmark scenarios and compare them against the recorded baseline")
+    parser.addoption("--gasBenchUpdate", action="store_true", help="With --gasBench, record the measured gas as the new baseline instead of comparing against it")
+    parser.addoption("--profileSource", action="store_true", help="Attribute the gas of every instruction the tests execute to Solidity source lines and print the most expensive lines")
+    parser.addoption("--sourceProfileDir", action="store", default=None, help="With --profileSource, also write every source file that used gas annotated with the gas of each line to this directory")
+    parser.addoption("--profileStorage", action="store_true", help="Count every SLOAD and SSTORE per contract, storage variable and transaction and print the totals")
+    parser.addoption("--storageProfileFile", action="store", default=None, help="With --profileStorage, also write the counts of every single storage slot to this JSON file")
+    parser.addoption("--setupTimings", action="store_true", help="Print how long each phase of the session setup and each contract took")
+    parser.addoption("--setupTimingsFile", action="store", default=None, help="Write the session setup timings to this JSON file")
+    parser.addoption("--snapshotMemoryBudget", action="store", type=int, default=1024, help="Megabytes of snapshot state to keep in memory before the least recently used snapshots are moved to disk")
+    parser.addoption("--testDurationsFile", action="store", default=None, help="Where the duration of every test is recorded after each run and read from by --scheduleByDuration and --testShard (test_durations.json in the compilation cache by default)")
+    parser.addoption("--scheduleByDuration", action="store_true", help="Run modules needing the same session snapshot together, the longest ones first")
+    parser.addoption("--testShard", action="store", default=None, help="Only run shard K/N of the modules, split so every shard takes about as long going by the recorded durations of --testDurationsFile, which every shard has to be given the same copy of. Without --testDurationsFile modules are split by a hash of their path")
+    parser.addoption("--scenarioGraph", action="store_true", help="Print the named scenarios the tests can start from, which scenario each is built from and how long the ones used took to build")
+    parser.addoption("--contractSizes", action="store_true", help="Print the deployed size of every compiled contract and which functions the bytes of the largest ones went to")
+    parser.addoption("--loadTest", action="store_true", help="Run the seeded trading and reporting load test and print its throughput and gas per operation")
+    parser.addoption("--loadSeed", action="store", type=int, default=0, help="With --loadTest, the seed of the random workload, so a run can be repeated exactly")
+    parser.addoption("--loadUniverses", action="store", type=int, default=1, help="With --loadTest, the number of universes markets are spread over")
+    parser.addoption("--loadMarkets", action="store", default="4,2,2", help="With --loadTest, the number of yes/no, categorical and scalar markets created in every stage")
+    parser.addoption("--loadTraders", action="store", type=int, default=4, help="With --loadTest, the number of accounts that trade")
+    parser.addoption("--loadOperations", action="store", type=int, default=200, help="With --loadTest, the number of trading operations in every stage")
+    parser.addoption("--loadStages", action="store", type=int, default=4, help="With --loadTest, the number of stages, each adding markets and trading on all of them")
+    parser.addoption("--loadReportFile", action="store", default=None, help="With --loadTest, also write the stats of every stage and operation to this JSON file")
+    parser.addoption("--universeBench", action="store_true", help="Run the benchmark that fills a universe with markets over many fee windows and print the gas of every operation per window")
+    parser.addoption("--universeBenchWindows", action="store", type=int, default=10, help="With --universeBench, the number of fee windows markets are created in")
+    parser.addoption("--universeBenchMarkets", action="store", type=int, default=100, help="With --universeBench, the number of markets created in every fee window")
+    parser.addoption("--universeBenchFile", action="store", default=None, help="With --universeBench, also write every measurement to this CSV file")
+    parser.addoption("--tradeModelCases", action="store", type=int, default=100000, help="The number of random fills every trade model fuzz test runs through the Python model of order settlement")
+    parser.addoption("--tradeModelReplays", action="store", type=int, default=20, help="The most fills per market the trade model fuzz test replays on chain, edge cases first, to compare with the model")
+    parser.addoption("--tradeModelSampleRate", action="store", type=float, default=0.0001, help="The fraction of fills without new edge conditions the trade model fuzz test replays on chain anyway")
+    parser.addoption("--tradeModelSeed", action="store", type=int, default=None, help="The seed of the trade model fuzz tests, to reproduce a failure. A random one is printed with the output of every test otherwise")
+    parser.addoption("--contractSizeHistory", action="store", default=None, help="With --contractSizes, compare the sizes against the last other commit in this JSON file and record them under the current commit")
 
 def pytest_configure(config):
     # register an additional marker
     config.addinivalue_line("markers",
         "cover: use coverage contracts")
+    if config.option.cover and getattr(config.option, 'numprocesses', None):
+        raise pytest.UsageError("--cover writes every event to a single file and can't be combined with pytest-xdist")
+    if config.option.gasBench and getattr(config.option, 'numprocesses', None):
+        raise pytest.UsageError("--gasBench collects every measurement in a single process and can't be combined with pytest-xdist")
+    if (config.option.profileSource or config.option.profileStorage) and getattr(config.option, 'numprocesses', None):
+        raise pytest.UsageError("--profileSource and --profileStorage aggregate every instruction in a single process and can't be combined with pytest-xdist")
+    if config.option.loadTest and getattr(config.option, 'numprocesses', None):
+        raise pytest.UsageError("--loadTest measures wall time and can't be combined with pytest-xdist")
+    if config.option.loadTraders > 9:
+        raise pytest.UsageError("--loadTraders can be at most 9, the number of test accounts besides the market creator")
+    config.loadGenerators = []
+    if config.option.universeBench and getattr(config.option, 'numprocesses', None):
+        raise pytest.UsageError("--universeBench measures wall time and can't be combined with pytest-xdist")
+    if config.option.universeBenchWindows < 1 or config.option.universeBenchMarkets < 1:
+        raise pytest.UsageError("--universeBenchWindows and --universeBenchMarkets have to be at least 1")
+    config.universeBenchmarks = []
+    config.gasBaseline = GasBaseline(resolveRelativePath('./gas_baseline.json'), config.option.gasBenchUpdate) if config.option.gasBench else None
+    if config.option.testShard:
+        try:
+            parseShard(config.option.testShard)
+        except ValueError as error:
+            raise pytest.UsageError("--testShard %s: %s" % (config.option.testShard, error))
+    config.durationHistory = DurationHistory(config.option.testDurationsFile or path.join(COMPILATION_CACHE, 'test_durations.json'))
+    config.snapshotStore = SnapshotStore(config.option.snapshotMemoryBudget * 10**6)
+    config.sourceProfiler = None
+    if config.option.profileSource:
+        config.sourceProfiler = SourceProfiler(ContractsFixture.artifacts, REPOSITORY_ROOT)
+        config.sourceProfiler.start()
+    config.storageProfiler = None
+    if config.option.profileStorage:
+        config.storageProfiler = StorageProfiler(ContractsFixture.artifacts, ContractsFixture.functionSelectors)
+        config.storageProfiler.start()
+
+def pytest_collection_modifyitems(session, config, items):
+    if not config.option.scheduleByDuration and not config.option.testShard: return
+    groups = groupModules(items, config.durationHistory, SESSION_SNAPSHOTS)
+    if config.option.testShard:
+        index, count = parseShard(config.option.testShard)
+        # every job has to come up with the same split, which the durations in a job's own cache don't guarantee
+        if config.option.testDurationsFile:
+            shards, shardSeconds = partitionModules(groups, count)
+        else:
+            shards = hashModules(groups, count)
+        selected = set(shards[index - 1])
+        config.hook.pytest_deselected(items=[item for group in groups if group not in selected for item in group.items])
+        groups = [group for group in groups if group in selected]
+    if config.option.scheduleByDuration:
+        groups = orderModules(groups)
+    items[:] = [item for group in groups for item in group.items]
+
+def pytest_runtest_logreport(report):
+    # under pytest-xdist the reports of every worker end up in the controlling process too, which records them all
+    if isXdistWorker(pytest.config): return
+    pytest.config.durationHistory.add(report.nodeid, report.duration)
+
+def pytest_sessionfinish(session):
+    if isXdistWorker(session.config): return
+    session.config.durationHistory.save()
+
+def pytest_unconfigure(config):
+    config.snapshotStore.close()
+
+def pytest_runtest_call(item):
+    sessionTimer.markFirstTest()
+
+def pytest_terminal_summary(terminalreporter):
+    if terminalreporter.config.option.setupTimings:
+        terminalreporter.write_sep("=", "session setup timings")
+        for line in sessionTimer.formatPhases():
+            terminalreporter.write_line(line)
+        terminalreporter.write_line("")
+        for line in sessionTimer.formatContracts(40):
+            terminalreporter.write_line(line)
+        terminalreporter.write_line("")
+        for line in terminalreporter.config.snapshotStore.formatReport():
+            terminalreporter.write_line(line)
+    if terminalreporter.config.option.setupTimingsFile:
+        sessionTimer.writeReport(terminalreporter.config.option.setupTimingsFile)
+    if terminalreporter.config.option.scenarioGraph:
+        terminalreporter.write_sep("=", "scenarios")
+        for line in scenarios.formatGraph():
+            terminalreporter.write_line(line)
+    if terminalreporter.config.option.contractSizes:
+        writeContractSizes(terminalreporter)
+    gasBaseline = terminalreporter.config.gasBaseline
+    if gasBaseline and gasBaseline.measurements:
+        terminalreporter.write_sep("=", "gas benchmark")
+        for line in gasBaseline.formatTable():
+            terminalreporter.write_line(line)
+        # a scenario without a baseline can't fail, so a missing baseline must not pass for a clean run
+        unrecordedScenarios = gasBaseline.getUnrecordedScenarios()
+        if unrecordedScenarios and not gasBaseline.update:
+            terminalreporter.write_line("WARNING: %d scenarios have no baseline and were not checked for regressions, record them with --gasBenchUpdate: %s" % (len(unrecordedScenarios), ', '.join(unrecordedScenarios)), red=True, bold=True)
+        if gasBaseline.update:
+            gasBaseline.save()
+            terminalreporter.write_line("Wrote %d scenarios to %s" % (len(gasBaseline.measurements), gasBaseline.baselinePath))
+    for generator in terminalreporter.config.loadGenerators:
+        terminalreporter.write_sep("=", "load test (seed %d)" % generator.profile.seed)
+        for line in generator.formatReport():
+            terminalreporter.write_line(line)
+    for benchmark in terminalreporter.config.universeBenchmarks:
+        terminalreporter.write_sep("=", "universe scale benchmark (mean gas per fee window)")
+        for line in benchmark.formatReport():
+            terminalreporter.write_line(line)
+    # both profilers wrap the same hooks, so they have to be unwound in the reverse order they were started
+    storageProfiler = terminalreporter.config.storageProfiler
+    if storageProfiler:
+        storageProfiler.stop()
+    sourceProfiler = terminalreporter.config.sourceProfiler
+    if sourceProfiler:
+        sourceProfiler.stop()
+        terminalreporter.write_sep("=", "source line gas hotspots")
+        for line in sourceProfiler.formatHotspots(40):
+            terminalreporter.write_line(line)
+        sourceProfileDirectory = terminalreporter.config.option.sourceProfileDir
+        if sourceProfileDirectory:
+            sourcePaths = sourceProfiler.writeAnnotatedSources(sourceProfileDirectory)
+            terminalreporter.write_line("Wrote %d annotated source files to %s" % (len(sourcePaths), sourceProfileDirectory))
+    if storageProfiler:
+        terminalreporter.write_sep("=", "storage access")
+        for line in storageProfiler.formatReport(40):
+            terminalreporter.write_line(line)
+        storageProfileFile = terminalreporter.config.option.storageProfileFile
+        if storageProfileFile:
+            storageProfiler.writeReport(storageProfileFile)
+            terminalreporter.write_line("Wrote the storage access of every slot to %s" % storageProfileFile)
+
+def getCommit():
+    try:
+        commit = check_output(['git', 'rev-parse', 'HEAD'], cwd=REPOSITORY_ROOT).strip()
+        # uncommitted contract changes get their own entry so they are compared against the commit they are based on
+        if call(['git', 'diff', '--quiet', 'HEAD', '--', 'source/contracts'], cwd=REPOSITORY_ROOT) != 0:
+            commit += '-dirty'
+        return commit
+    except (OSError, CalledProcessError):
+        return 'unknown'
+
+def writeContractSizes(terminalreporter):
+    # the artifacts read so far are only those of the contracts this run uploaded, the sizes cover everything that was compiled
+    ContractsFixture.loadCompiledArtifacts()
+    if not ContractsFixture.artifacts:
+        terminalreporter.write_line("No contracts were compiled in this run, so there are no contract sizes to report")
+        return
+    report = ContractSizeReport(ContractsFixture.artifacts, CONTRACT_SIZE_LIMIT, CONTRACT_SIZE_WARN_LEVEL)
+    history = ContractSizeHistory(terminalreporter.config.option.contractSizeHistory)
+    commit = getCommit()
+    previousSizes = history.getPreviousSizes(commit)
+    terminalreporter.write_sep("=", "contract sizes")
+    for line in report.formatSizes(previousSizes, 40):
+        terminalreporter.write_line(line)
+    terminalreporter.write_line("")
+    for line in report.formatBreakdowns(previousSizes, 15):
+        terminalreporter.write_line(line)
+    if history.historyPath:
+        history.record(commit, report.sizes)
+        history.save()
+        terminalreporter.write_line("Recorded the sizes of %d contracts for %s in %s" % (len(report.sizes), commit, history.historyPath))
+
+def pytest_sessionstart(session):
+    # Under pytest-xdist this process only coordinates the workers. Compile everything and build the kitchen sink snapshot here once so every worker can load it from disk instead of building it itself.
+    if not isXdistCoordinator(session.config): return
+    fixture = ContractsFixture()
+    fixture.compileAllContracts()
+    baseSnapshot = fixture.createSnapshot()
+    controllerSnapshot = fixture.getOrCreatePersistedSnapshot('controller', lambda: createControllerSnapshot(fixture, baseSnapshot))
+    augurInitializedSnapshot = fixture.getOrCreatePersistedSnapshot('augurInitialized', lambda: createAugurInitializedSnapshot(fixture, controllerSnapshot))
+    fixture.getOrCreatePersistedSnapshot('kitchenSink', lambda: createKitchenSinkSnapshot(fixture, augurInitializedSnapshot))
 
 class ContractsFixture:
     signatures = {}
     compiledCode = {}
+    artifacts = {}
+    artifactPaths = {}
+    compiledArtifactPaths = {}
+    translators = {}
+    functionSelectors = {}
 
     ####
     #### Static Methods
@@ -73,122 +491,161 @@ class ContractsFixture:
     @staticmethod
     def ensureCacheDirectoryExists():
         if not path.exists(COMPILATION_CACHE):
-            makedirs(COMPILATION_CACHE)
+            try:
+                makedirs(COMPILATION_CACHE)
+            except OSError:
+                # another process sharing the cache may have just created it
+                if not path.isdir(COMPILATION_CACHE): raise
 
-    def generateSignature(self, relativeFilePath):
-        ContractsFixture.ensureCacheDirectoryExists()
+    @staticmethod
+    def getTranslator(signatureName):
+        # Parsing an ABI is expensive and helpers like applySignature run in tight loops, so each ABI is parsed once and the translator is shared by every ABIContract the fixture builds
+        if signatureName not in ContractsFixture.translators:
+            with sessionTimer.phase('parse abi', signatureName):
+                translator = ContractTranslator(ContractsFixture.signatures[signatureName])
+                for functionName, functionData in translator.function_data.items():
+                    ContractsFixture.functionSelectors[functionData['prefix']] = functionName
+                registerEvents(translator)
+                ContractsFixture.translators[signatureName] = translator
+        return ContractsFixture.translators[signatureName]
+
+    # Contracts of a persisted snapshot are bound to translators that were parsed in an earlier run, so their selectors are taken from the ABI of the artifact as it is read instead
+    @staticmethod
+    def registerFunctionSelectors(abi):
+        for entry in abi:
+            if entry.get('type', 'function') != 'function': continue
+            ContractsFixture.functionSelectors.setdefault(method_id(entry['name'], [input['type'] for input in entry.get('inputs', [])]), entry['name'])
+
+    def getArtifactPath(self, filePath, dependencySet):
+        name = path.splitext(path.basename(filePath))[0]
+        sourceHashes = dict((dependencyPath, self.importGraph.getHash(dependencyPath)) for dependencyPath in dependencySet)
+        cacheKey = getCacheKey(path.abspath(filePath), sourceHashes, self.relativeContractsPath, self.relativeTestContractsPath)
+        return path.join(COMPILATION_CACHE, '%s-%s.json' % (name, cacheKey))
+
+    def getArtifact(self, relativeFilePath):
         filename = path.basename(relativeFilePath)
         name = path.splitext(filename)[0]
-        outputPath = path.join(COMPILATION_CACHE,  name + 'Signature')
-        lastCompilationTime = path.getmtime(outputPath) if path.isfile(outputPath) else 0
-        if path.getmtime(relativeFilePath) > lastCompilationTime:
-            print('generating signature for ' + name)
-            extension = path.splitext(filename)[1]
-            signature = None
-            if extension == '.sol':
-                signature = self.compileSolidity(relativeFilePath)['abi']
-            else:
-                raise
-            with open(outputPath, mode='w') as file:
-                json_dump(signature, file)
+        if name in ContractsFixture.artifacts:
+            return ContractsFixture.artifacts[name]
+        if path.splitext(filename)[1] != '.sol':
+            raise Exception("Don't know how to compile %s" % relativeFilePath)
+        with sessionTimer.phase('load artifact', name):
+            return self.loadArtifact(relativeFilePath, name)
+
+    def loadArtifact(self, relativeFilePath, name):
+        dependencySet = set()
+        self.getAllDependencies(relativeFilePath, dependencySet)
+        ContractsFixture.ensureCacheDirectoryExists()
+        self.importGraph.save()
+        artifactPath = self.getArtifactPath(relativeFilePath, dependencySet)
+        if not path.isfile(artifactPath):
+            with CacheLock('compile'):
+                # another process may have compiled it while we waited for the lock
+                if not path.isfile(artifactPath):
+                    print('compiling ' + name + '...')
+                    with sessionTimer.phase('compile', name):
+                        writeArtifact(artifactPath, createArtifact(self.compileSolidity(relativeFilePath)))
         else:
-            pass#print('using cached signature for ' + name)
-        with open(outputPath, 'r') as file:
-            signature = json_load(file)
-        return(signature)
+            pass#print('using cached compilation for ' + name)
+        return self.readArtifact(name, artifactPath)
+
+    @staticmethod
+    def readArtifact(name, artifactPath):
+        with open(artifactPath, 'r') as file:
+            artifact = json_load(file)
+        ContractsFixture.artifacts[name] = artifact
+        ContractsFixture.artifactPaths[name] = artifactPath
+        ContractsFixture.registerFunctionSelectors(artifact['abi'])
+        return(artifact)
+
+    @staticmethod
+    def loadCompiledArtifacts():
+        for name, artifactPath in ContractsFixture.compiledArtifactPaths.items():
+            if name in ContractsFixture.artifacts: continue
+            with sessionTimer.phase('load artifact', name):
+                ContractsFixture.readArtifact(name, artifactPath)
+
+    # The contracts of a persisted snapshot were uploaded by an earlier run, so nothing reads their artifacts in this one unless a test uploads the same contract again
+    def loadSnapshotArtifacts(self, snapshot):
+        for relativeFilePath, artifactName in snapshot['artifacts'].items():
+            name = path.splitext(path.basename(relativeFilePath))[0]
+            if name in ContractsFixture.artifacts: continue
+            with sessionTimer.phase('load artifact', name):
+                self.readArtifact(name, path.join(COMPILATION_CACHE, artifactName))
+
+    def generateSignature(self, relativeFilePath):
+        return(self.getArtifact(relativeFilePath)['abi'])
 
     def getCompiledCode(self, relativeFilePath):
         filename = path.basename(relativeFilePath)
         name = path.splitext(filename)[0]
         if name in ContractsFixture.compiledCode:
             return ContractsFixture.compiledCode[name]
-        dependencySet = set()
-        self.getAllDependencies(relativeFilePath, dependencySet)
-        ContractsFixture.ensureCacheDirectoryExists()
-        compiledOutputPath = path.join(COMPILATION_CACHE, name)
-        lastCompilationTime = path.getmtime(compiledOutputPath) if path.isfile(compiledOutputPath) else 0
-        needsRecompile = False
-        for dependencyPath in dependencySet:
-            if (path.getmtime(dependencyPath) > lastCompilationTime):
-                needsRecompile = True
-                break
-        if (needsRecompile):
-            print('compiling ' + name + '...')
-            extension = path.splitext(filename)[1]
-            compiledCode = None
-            if extension == '.sol':
-                compiledCode = bytearray.fromhex(self.compileSolidity(relativeFilePath)['evm']['bytecode']['object'])
-            else:
-                raise
-            with io_open(compiledOutputPath, mode='wb') as file:
-                file.write(compiledCode)
-        else:
-            pass#print('using cached compilation for ' + name)
-        with io_open(compiledOutputPath, mode='rb') as file:
-            compiledCode = file.read()
-            contractSize = len(compiledCode)
-            if (contractSize >= CONTRACT_SIZE_LIMIT):
-                print('%sContract %s is OVER the size limit by %d bytes%s' % (bcolors.FAIL, name, contractSize - CONTRACT_SIZE_LIMIT, bcolors.ENDC))
-            elif (contractSize >= CONTRACT_SIZE_WARN_LEVEL):
-                print('%sContract %s is under size limit by only %d bytes%s' % (bcolors.WARN, name, CONTRACT_SIZE_LIMIT - contractSize, bcolors.ENDC))
-            elif (contractSize > 0):
-                pass#print('Size: %i' % contractSize)
-            ContractsFixture.compiledCode[name] = compiledCode
-            return(compiledCode)
+        compiledCode = str(bytearray.fromhex(self.getArtifact(relativeFilePath)['bytecode']))
+        contractSize = len(compiledCode)
+        if (contractSize >= CONTRACT_SIZE_LIMIT):
+            print('%sContract %s is OVER the size limit by %d bytes, run with --contractSizes to see where they went%s' % (bcolors.FAIL, name, contractSize - CONTRACT_SIZE_LIMIT, bcolors.ENDC))
+        elif (contractSize >= CONTRACT_SIZE_WARN_LEVEL):
+            print('%sContract %s is under size limit by only %d bytes, run with --contractSizes to see where they went%s' % (bcolors.WARN, name, CONTRACT_SIZE_LIMIT - contractSize, bcolors.ENDC))
+        elif (contractSize > 0):
+            pass#print('Size: %i' % contractSize)
+        ContractsFixture.compiledCode[name] = compiledCode
+        return(compiledCode)
 
     def compileSolidity(self, relativeFilePath):
         absoluteFilePath = resolveRelativePath(relativeFilePath)
-        filename = path.basename(relativeFilePath)
-        contractName = path.splitext(filename)[0]
         print absoluteFilePath
-        compilerParameter = {
-            'language': 'Solidity',
-            'sources': {
-                absoluteFilePath: {
-                    'urls': [ absoluteFilePath ]
-                }
-            },
-            'settings': {
-                # TODO: Remove 'remappings' line below and update 'sources' line above
-                'remappings': [ '=%s/' % resolveRelativePath(self.relativeContractsPath), 'TEST=%s/' % resolveRelativePath(self.relativeTestContractsPath) ],
-                'optimizer': {
-                    'enabled': True,
-                    'runs': 200
-                },
-                'outputSelection': {
-                    "*": {
-                        '*': [ 'metadata', 'evm.bytecode', 'evm.sourceMap', 'abi' ]
-                    }
-                }
-            }
-        }
-        return compile_standard(compilerParameter, allow_paths=resolveRelativePath("../"))['contracts'][absoluteFilePath][contractName]
+        return compileSolidity(absoluteFilePath, self.relativeContractsPath, self.relativeTestContractsPath)
 
     def getAllDependencies(self, filePath, knownDependencies):
-        knownDependencies.add(filePath)
-        fileDirectory = path.dirname(filePath)
-        with open(filePath, 'r') as file:
-            fileContents = file.read()
-        matches = findall("inset\('(.*?)'\)", fileContents)
-        for match in matches:
-            dependencyPath = path.abspath(path.join(fileDirectory, match))
-            if not dependencyPath in knownDependencies:
-                self.getAllDependencies(dependencyPath, knownDependencies)
-        matches = findall("create\('(.*?)'\)", fileContents)
-        for match in matches:
-            dependencyPath = path.abspath(path.join(fileDirectory, match))
-            if not dependencyPath in knownDependencies:
-                self.getAllDependencies(dependencyPath, knownDependencies)
-        matches = findall("import ['\"](.*?)['\"]", fileContents)
-        for match in matches:
-            dependencyPath = path.join(BASE_PATH, self.relativeContractsPath, match)
-            if "TEST" in dependencyPath:
-                dependencyPath = path.join(BASE_PATH, self.relativeTestContractsPath, match).replace("TEST/", "")
-            if not path.isfile(dependencyPath):
-                raise Exception("Could not resolve dependency file path: %s" % dependencyPath)
-            if not dependencyPath in knownDependencies:
-                self.getAllDependencies(dependencyPath, knownDependencies)
-        return(knownDependencies)
+        return self.importGraph.getAllDependencies(filePath, knownDependencies)
+
+    def compileAllContracts(self):
+        # Only one process compiles at a time. Any other process sharing the cache waits and then finds everything up to date.
+        with sessionTimer.phase('compile all contracts'):
+            with CacheLock('compile'):
+                self.compileStaleContracts()
+
+    def compileStaleContracts(self):
+        dependencies = {}
+        with sessionTimer.phase('scan dependencies'):
+            for relativeDirectory in [self.relativeContractsPath, self.relativeTestContractsPath]:
+                for directory, _, filenames in walk(resolveRelativePath(relativeDirectory)):
+                    # legacy reputation shares file names with other contracts and is never uploaded
+                    if 'legacy_reputation' in directory: continue
+                    for filename in filenames:
+                        if path.splitext(filename)[1] != '.sol': continue
+                        filePath = path.join(directory, filename)
+                        dependencies[filePath] = self.getAllDependencies(filePath, set())
+            self.importGraph.save()
+        artifactPaths = {}
+        staleFilePaths = []
+        with sessionTimer.phase('check cache'):
+            for filePath, dependencySet in dependencies.items():
+                artifactPaths[filePath] = self.getArtifactPath(filePath, dependencySet)
+                if not path.isfile(artifactPaths[filePath]):
+                    staleFilePaths.append(filePath)
+                ContractsFixture.compiledArtifactPaths[path.splitext(path.basename(filePath))[0]] = artifactPaths[filePath]
+        if not staleFilePaths: return
+        with sessionTimer.phase('compile'):
+            self.compileInPool(staleFilePaths, dependencies, artifactPaths)
+
+    def compileInPool(self, staleFilePaths, dependencies, artifactPaths):
+        # solc compiles every contract together with its whole import graph, so contracts are independent jobs. Start the ones with the biggest graphs first so they don't end up as the stragglers.
+        staleFilePaths.sort(key=lambda filePath: len(dependencies[filePath]), reverse=True)
+        compileJobs = [(filePath, self.relativeContractsPath, self.relativeTestContractsPath) for filePath in staleFilePaths]
+        pool = Pool(min(cpu_count(), len(compileJobs)))
+        try:
+            for filePath, artifact, error, elapsed in pool.imap_unordered(compileSolidityInWorker, compileJobs):
+                # the pool compiles in parallel, so these add up to more than the wall time of the compile phase
+                sessionTimer.recordContract(path.splitext(path.basename(filePath))[0], 'compile', elapsed)
+                if error:
+                    raise Exception("Failed to compile %s: %s" % (filePath, error))
+                # Write the same artifact the sequential path produces so getArtifact finds it up to date
+                writeArtifact(artifactPaths[filePath], artifact)
+        finally:
+            pool.terminate()
+            pool.join()
 
     ####
     #### Class Methods
@@ -206,27 +663,45 @@ class ContractsFixture:
             tester.base_alloc[getattr(tester, 'a%i' % a)] = {'balance': 10**24}
 
         self.chain = Chain(env=Env(config=config_metropolis))
-        self.contracts = {}
+        self.contracts = LazyContracts(self.chain, {})
         self.testerAddress = self.generateTesterMap('a')
         self.testerKey = self.generateTesterMap('k')
         self.testerAddressToKey = dict(zip(self.testerAddress.values(), self.testerKey.values()))
-        if path.isfile('./allFiredEvents'):
-            remove_file('./allFiredEvents')
+        if path.isfile(EVENT_LOG_PATH):
+            remove_file(EVENT_LOG_PATH)
         self.relativeContractsPath = '../source/contracts'
         self.relativeTestContractsPath = 'solidity_test_helpers'
         self.externalContractsPath = '../source/contracts/external'
         self.coverageMode = pytest.config.option.cover
         self.subFork = pytest.config.option.subFork
+        # Under pytest-xdist the coordinator has already rebuilt the snapshots, so workers just load them
+        self.freshSnapshots = pytest.config.option.freshSnapshots and not isXdistWorker(pytest.config)
+        self.profileGas = pytest.config.option.profileGas
+        self.gasProfileDirectory = pytest.config.option.gasProfileDir
+        self.gasBaseline = pytest.config.gasBaseline
+        # the profilers recognize contracts by their code, so they need the artifact of every contract on chain and not just of the ones uploaded in this process
+        self.loadAllSnapshotArtifacts = pytest.config.option.profileSource or pytest.config.option.profileStorage or self.profileGas
+        self.snapshotStore = pytest.config.snapshotStore
+        self.uploadedArtifacts = {}
+        self.checkpointSnapshot = None
+        self.checkpoint = None
+        self.eventLog = EventLogWriter(EVENT_LOG_PATH) if self.coverageMode else None
         if self.coverageMode:
             self.chain.head_state.log_listeners.append(self.writeLogToFile)
             self.relativeContractsPath = '../coverageEnv/contracts'
             self.relativeTestContractsPath = '../coverageEnv/solidity_test_helpers'
             self.externalContractsPath = '../coverageEnv/contracts/external'
+        self.importGraph = ImportGraph(path.join(COMPILATION_CACHE, 'importGraph.json'), REPOSITORY_ROOT, resolveRelativePath(self.relativeContractsPath), resolveRelativePath(self.relativeTestContractsPath))
 
+    def getEventBus(self):
+        return EventBus.forState(self.chain.head_state)
 
     def writeLogToFile(self, message):
-        with open('./allFiredEvents', 'a') as logsFile:
-            logsFile.write(json_dumps(message.to_dict()) + '\n')
+        self.eventLog.write(message)
+
+    def close(self):
+        if self.eventLog:
+            self.eventLog.close()
 
     def distributeRep(self, universe):
         # Get the reputation token for this universe and migrate legacy REP to it
@@ -243,7 +718,8 @@ class ContractsFixture:
         lookupKey = lookupKey if lookupKey else path.splitext(path.basename(relativeFilePath))[0]
         contract = self.upload(relativeFilePath, lookupKey, signatureKey, constructorArgs)
         if not contract: return None
-        self.contracts['Controller'].registerContract(lookupKey.ljust(32, '\x00'), contract.address, garbageBytes20, garbageBytes32)
+        with sessionTimer.phase('register', lookupKey):
+            self.contracts['Controller'].registerContract(lookupKey.ljust(32, '\x00'), contract.address, garbageBytes20, garbageBytes32)
         return(contract)
 
     def upload(self, relativeFilePath, lookupKey = None, signatureKey = None, constructorArgs=[]):
@@ -254,51 +730,180 @@ class ContractsFixture:
         signatureKey = signatureKey if signatureKey else lookupKey
         if lookupKey in self.contracts:
             return(self.contracts[lookupKey])
-        compiledCode = self.getCompiledCode(resolvedPath)
-        # abstract contracts have a 0-length array for bytecode
-        if len(compiledCode) == 0:
-            if ("libraries" in relativeFilePath or lookupKey.startswith("I") or lookupKey.startswith("Base")):
-                pass#print "Skipping upload of " + lookupKey + " because it had no bytecode (likely a abstract class/interface)."
-            else:
-                raise Exception("Contract: " + lookupKey + " has no bytecode, but this is not expected. It probably doesn't implement all its abstract methods")
-            return None
-        if signatureKey not in ContractsFixture.signatures:
-            ContractsFixture.signatures[signatureKey] = self.generateSignature(resolvedPath)
-        signature = ContractsFixture.signatures[signatureKey]
-        contractTranslator = ContractTranslator(signature)
-        if len(constructorArgs) > 0:
-            compiledCode += contractTranslator.encode_constructor_arguments(constructorArgs)
+        with sessionTimer.phase('upload', lookupKey):
+            compiledCode = self.getCompiledCode(resolvedPath)
+            self.uploadedArtifacts[path.relpath(resolvedPath, REPOSITORY_ROOT)] = path.basename(ContractsFixture.artifactPaths[path.splitext(path.basename(resolvedPath))[0]])
+            # abstract contracts have a 0-length array for bytecode
+            if len(compiledCode) == 0:
+                if ("libraries" in relativeFilePath or lookupKey.startswith("I") or lookupKey.startswith("Base")):
+                    pass#print "Skipping upload of " + lookupKey + " because it had no bytecode (likely a abstract class/interface)."
+                else:
+                    raise Exception("Contract: " + lookupKey + " has no bytecode, but this is not expected. It probably doesn't implement all its abstract methods")
+                return None
+            if signatureKey not in ContractsFixture.signatures:
+                ContractsFixture.signatures[signatureKey] = self.generateSignature(resolvedPath)
+            contractTranslator = ContractsFixture.getTranslator(signatureKey)
+            with sessionTimer.phase('deploy', lookupKey):
+                if len(constructorArgs) > 0:
+                    compiledCode += contractTranslator.encode_constructor_arguments(constructorArgs)
+                    contractAddress = bytesToHexString(self.chain.contract(compiledCode, language='evm'))
+                else:
+                    contractAddress = self.deployWithoutConstructorArgs(resolvedPath, compiledCode)
+            contract = ABIContract(self.chain, contractTranslator, contractAddress)
+            self.contracts[lookupKey] = contract
+            return(contract)
+
+    def getDeploymentTemplatePath(self, resolvedPath):
+        # Coverage runs have to execute every constructor so its lines get counted
+        if self.coverageMode: return None
+        name = path.splitext(path.basename(resolvedPath))[0]
+        if not hasContextIndependentConstructor(self.getArtifact(resolvedPath)): return None
+        artifactName = path.splitext(path.basename(ContractsFixture.artifactPaths[name]))[0]
+        return path.join(COMPILATION_CACHE, 'templates', '%s-%s.json' % (artifactName, hexlify(tester.a0)))
+
+    def deployWithoutConstructorArgs(self, resolvedPath, compiledCode):
+        # The first EVM deployment of a contract records the storage its constructor left behind. Later deployments write the compiler's runtime code and that storage straight into the state, which skips executing the constructor.
+        templatePath = self.getDeploymentTemplatePath(resolvedPath)
+        if templatePath and path.isfile(templatePath):
+            with open(templatePath, 'r') as file:
+                return self.injectContract(self.getArtifact(resolvedPath)['deployedBytecode'], json_load(file))
         contractAddress = bytesToHexString(self.chain.contract(compiledCode, language='evm'))
-        contract = ABIContract(self.chain, contractTranslator, contractAddress)
-        self.contracts[lookupKey] = contract
-        return(contract)
+        if templatePath:
+            account = self.chain.head_state.account_to_dict(contractAddress)
+            if account['code'][2:] == self.getArtifact(resolvedPath)['deployedBytecode']:
+                if not path.exists(path.dirname(templatePath)):
+                    makedirs(path.dirname(templatePath))
+                writeArtifact(templatePath, { 'nonce': account['nonce'], 'storage': account['storage'] })
+        return contractAddress
+
+    def injectContract(self, deployedBytecode, template):
+        state = self.chain.head_state
+        # the address and nonce bump match what a contract creation transaction from the same sender would produce
+        contractAddress = utils.mk_contract_address(tester.a0, state.get_nonce(tester.a0))
+        state.increment_nonce(tester.a0)
+        state.set_code(contractAddress, str(bytearray.fromhex(deployedBytecode)))
+        state.set_nonce(contractAddress, int(template['nonce']))
+        for key, value in template['storage'].items():
+            state.set_storage_data(contractAddress, int(key[2:] or '0', 16), int(value[2:] or '0', 16))
+        state.commit()
+        return bytesToHexString(contractAddress)
 
     def applySignature(self, signatureName, address):
         assert address
         if type(address) is long:
             address = longToHexString(address)
-        translator = ContractTranslator(ContractsFixture.signatures[signatureName])
-        contract = ABIContract(self.chain, translator, address)
+        contract = ABIContract(self.chain, ContractsFixture.getTranslator(signatureName), address)
         return contract
 
     def createSnapshot(self):
+        with sessionTimer.phase('create snapshot'):
+            return self.createSnapshotOfChain()
+
+    def createSnapshotOfChain(self):
         self.chain.tx(sender=tester.k0, to=tester.a1, value=0)
         self.chain.mine(1)
-        contractsCopy = {}
-        for contractName in self.contracts:
-            contractsCopy[contractName] = dict(translator = self.contracts[contractName].translator, address = self.contracts[contractName].address)
-        return  { 'state': self.chain.head_state.to_snapshot(), 'contracts': contractsCopy }
+        return  { 'state': self.snapshotStore.add(self.chain.head_state.to_snapshot()), 'contracts': self.contracts.toSnapshot(), 'artifacts': dict(self.uploadedArtifacts) }
 
     def resetToSnapshot(self, snapshot):
         if not 'state' in snapshot: raise "snapshot is missing 'state'"
         if not 'contracts' in snapshot: raise "snapshot is missing 'contracts'"
-        self.chain = Chain(genesis=snapshot['state'], env=Env(config=config_metropolis))
+        if not self.revertToCheckpoint(snapshot):
+            self.chain = Chain(genesis=self.snapshotStore.get(snapshot['state']), env=Env(config=config_metropolis))
+            if self.coverageMode:
+                self.chain.head_state.log_listeners.append(self.writeLogToFile)
+            self.createCheckpoint(snapshot)
+        self.contracts = LazyContracts(self.chain, snapshot['contracts'])
+        self.uploadedArtifacts = dict(snapshot.get('artifacts', {}))
+
+    def createCheckpoint(self, snapshot):
+        # Building a Chain from a snapshot materializes the whole state trie. Instead we remember where the freshly built chain started and rewind it there when the same snapshot is requested again. Trie nodes are never deleted, so the rewind just points the state back at the old root and only the accounts a test touched get loaded again.
+        self.checkpointSnapshot = snapshot
+        self.checkpoint = dict(
+            chain = self.chain,
+            headState = self.chain.head_state,
+            chainSnapshot = self.chain.snapshot(),
+            # the event bus goes with the subscriptions of the test that created it
+            logListeners = [listener for listener in self.chain.head_state.log_listeners if not EventBus.isListener(listener)])
+
+    def revertToCheckpoint(self, snapshot):
+        if self.checkpointSnapshot is not snapshot: return False
+        checkpoint = self.checkpoint
+        # a test that mined a block has moved the chain to a new head state, which can't be rewound
+        if checkpoint['chain'].head_state is not checkpoint['headState']: return False
+        if checkpoint['chain'].block.number != checkpoint['chainSnapshot'][2]: return False
+        self.chain = checkpoint['chain']
+        self.chain.revert(checkpoint['chainSnapshot'])
+        # listeners added during a test (e.g. the event bus) aren't part of the state journal
+        self.chain.head_state.log_listeners[:] = checkpoint['logListeners']
+        return True
+
+    ####
+    #### Persisted Snapshots
+    ####
+
+    def getPersistedSnapshotPath(self, snapshotName):
+        # Anything that changes how the snapshots are built has to be part of the key. The contracts themselves are checked against the artifacts recorded in the file when it is loaded.
+        harnessHash = sha256()
+        for harnessFile in ['conftest.py', 'reporting_utils.py', 'utils.py']:
+            with open(resolveRelativePath(harnessFile), 'rb') as file:
+                harnessHash.update(file.read())
+        harnessHash.update(json_dumps({ 'subFork': self.subFork }))
+        return path.join(COMPILATION_CACHE, 'snapshots', '%s-%s.pickle' % (snapshotName, harnessHash.hexdigest()))
+
+    def persistSnapshot(self, snapshotName, snapshot):
+        persistedSnapshot = dict(snapshot)
+        persistedSnapshot['state'] = self.snapshotStore.get(snapshot['state'])
+        # ABIContracts hold a reference to the chain so only their translator and address are kept. They get bound to the loaded chain again in loadPersistedSnapshot.
+        for key, value in snapshot.items():
+            if isinstance(value, ABIContract):
+                persistedSnapshot[key] = PersistedContract(value.translator, value.address)
+        snapshotPath = self.getPersistedSnapshotPath(snapshotName)
+        if not path.exists(path.dirname(snapshotPath)):
+            makedirs(path.dirname(snapshotPath))
+        temporaryPath = '%s.%d' % (snapshotPath, getpid())
+        with open(temporaryPath, 'wb') as file:
+            pickle_dump({ 'signatures': ContractsFixture.signatures, 'snapshot': persistedSnapshot }, file, HIGHEST_PROTOCOL)
+        rename(temporaryPath, snapshotPath)
+
+    def loadPersistedSnapshot(self, snapshotName):
+        snapshotPath = self.getPersistedSnapshotPath(snapshotName)
+        if not path.isfile(snapshotPath):
+            return None
+        with open(snapshotPath, 'rb') as file:
+            persistedSnapshot = pickle_load(file)
+        snapshot = persistedSnapshot['snapshot']
+        for relativeFilePath, artifactName in snapshot['artifacts'].items():
+            filePath = path.join(REPOSITORY_ROOT, relativeFilePath)
+            if not path.isfile(filePath):
+                return None
+            if path.basename(self.getArtifactPath(filePath, self.getAllDependencies(filePath, set()))) != artifactName:
+                return None
+        self.importGraph.save()
+        if self.loadAllSnapshotArtifacts:
+            self.loadSnapshotArtifacts(snapshot)
+        for signatureKey, signature in persistedSnapshot['signatures'].items():
+            ContractsFixture.signatures.setdefault(signatureKey, signature)
+        snapshot['state'] = self.snapshotStore.add(snapshot['state'])
+        self.resetToSnapshot(snapshot)
+        for key, value in snapshot.items():
+            if isinstance(value, PersistedContract):
+                snapshot[key] = ABIContract(self.chain, value.translator, value.address)
+        return snapshot
+
+    def getOrCreatePersistedSnapshot(self, snapshotName, createSnapshot):
+        # Coverage runs need every event fired during setup, so they always build the snapshots from scratch
         if self.coverageMode:
-            self.chain.head_state.log_listeners.append(self.writeLogToFile)
-        self.contracts = {}
-        for contractName in snapshot['contracts']:
-            contract = snapshot['contracts'][contractName]
-            self.contracts[contractName] = ABIContract(self.chain, contract['translator'], contract['address'])
+            return createSnapshot()
+        with sessionTimer.phase(snapshotName + ' snapshot'), CacheLock('snapshot-' + snapshotName):
+            with sessionTimer.phase('load persisted snapshot'):
+                snapshot = None if self.freshSnapshots else self.loadPersistedSnapshot(snapshotName)
+            if snapshot:
+                return snapshot
+            with sessionTimer.phase('build'):
+                snapshot = createSnapshot()
+            with sessionTimer.phase('persist'):
+                self.persistSnapshot(snapshotName, snapshot)
+            return snapshot
 
     ####
     #### Bulk Operations
@@ -414,21 +1019,21 @@ class ContractsFixture:
     def getShareToken(self, market, outcome):
         shareTokenAddress = market.getShareToken(outcome)
         assert shareTokenAddress
-        shareToken = ABIContract(self.chain, ContractTranslator(ContractsFixture.signatures['ShareToken']), shareTokenAddress)
+        shareToken = ABIContract(self.chain, ContractsFixture.getTranslator('ShareToken'), shareTokenAddress)
         return shareToken
 
     def getOrCreateChildUniverse(self, parentUniverse, market, payoutDistribution):
         assert payoutDistributionHash
         childUniverseAddress = parentUniverse.getOrCreateChildUniverse(payoutDistribution, False)
         assert childUniverseAddress
-        childUniverse = ABIContract(self.chain, ContractTranslator(ContractsFixture.signatures['Universe']), childUniverseAddress)
+        childUniverse = ABIContract(self.chain, ContractsFixture.getTranslator('Universe'), childUniverseAddress)
         return childUniverse
 
     def createYesNoMarket(self, universe, endTime, feePerEthInWei, denominationToken, designatedReporterAddress, sender=tester.k0, topic="", description="description", extraInfo=""):
         marketCreationFee = universe.getOrCacheMarketCreationCost()
         marketAddress = universe.createYesNoMarket(endTime, feePerEthInWei, denominationToken.address, designatedReporterAddress, topic, description, extraInfo, value = marketCreationFee, sender=sender)
         assert marketAddress
-        market = ABIContract(self.chain, ContractTranslator(ContractsFixture.signatures['Market']), marketAddress)
+        market = ABIContract(self.chain, ContractsFixture.getTranslator('Market'), marketAddress)
         return market
 
     def createCategoricalMarket(self, universe, numOutcomes, endTime, feePerEthInWei, denominationToken, designatedReporterAddress, sender=tester.k0, topic="", description="description", extraInfo=""):
@@ -436,14 +1041,14 @@ class ContractsFixture:
         outcomes = [" "] * numOutcomes
         marketAddress = universe.createCategoricalMarket(endTime, feePerEthInWei, denominationToken.address, designatedReporterAddress, outcomes, topic, description, extraInfo, value = marketCreationFee, sender=sender)
         assert marketAddress
-        market = ABIContract(self.chain, ContractTranslator(ContractsFixture.signatures['Market']), marketAddress)
+        market = ABIContract(self.chain, ContractsFixture.getTranslator('Market'), marketAddress)
         return market
 
     def createScalarMarket(self, universe, endTime, feePerEthInWei, denominationToken, maxPrice, minPrice, numTicks, designatedReporterAddress, sender=tester.k0, description="description", extraInfo=""):
         marketCreationFee = universe.getOrCacheMarketCreationCost()
         marketAddress = universe.createScalarMarket(endTime, feePerEthInWei, denominationToken.address, designatedReporterAddress, minPrice, maxPrice, numTicks, "", description, extraInfo, value = marketCreationFee, sender=sender)
         assert marketAddress
-        market = ABIContract(self.chain, ContractTranslator(ContractsFixture.signatures['Market']), marketAddress)
+        market = ABIContract(self.chain, ContractsFixture.getTranslator('Market'), marketAddress)
         return market
 
     def createReasonableYesNoMarket(self, universe, denominationToken, sender=tester.k0, topic="", description="description", extraInfo=""):
@@ -482,32 +1087,39 @@ class ContractsFixture:
 
 @pytest.fixture(scope="session")
 def fixture():
-    return ContractsFixture()
+    fixture = ContractsFixture()
+    fixture.compileAllContracts()
+    yield fixture
+    fixture.close()
 
 @pytest.fixture(scope="session")
 def baseSnapshot(fixture):
     return fixture.createSnapshot()
 
-@pytest.fixture(scope="session")
-def controllerSnapshot(fixture, baseSnapshot):
+def createControllerSnapshot(fixture, baseSnapshot):
     fixture.resetToSnapshot(baseSnapshot)
     controller = fixture.upload('solidity_test_helpers/TestController.sol', lookupKey="Controller")
     assert fixture.contracts['Controller'].owner() == bytesToHexString(tester.a0)
     return fixture.createSnapshot()
 
-@pytest.fixture(scope="session")
-def augurInitializedSnapshot(fixture, controllerSnapshot):
+def createAugurInitializedSnapshot(fixture, controllerSnapshot):
     fixture.resetToSnapshot(controllerSnapshot)
-    fixture.uploadAugur()
-    fixture.uploadAllContracts()
-    fixture.initializeAllContracts()
-    fixture.whitelistTradingContracts()
-    fixture.approveCentralAuthority()
-    fixture.uploadExternalContracts()
+    with sessionTimer.phase('upload Augur'):
+        fixture.uploadAugur()
+    with sessionTimer.phase('upload all contracts'):
+        fixture.uploadAllContracts()
+    with sessionTimer.phase('initialize'):
+        fixture.initializeAllContracts()
+    with sessionTimer.phase('whitelist'):
+        fixture.whitelistTradingContracts()
+    with sessionTimer.phase('approve'):
+        fixture.approveCentralAuthority()
+    with sessionTimer.phase('upload external contracts'):
+        fixture.uploadExternalContracts()
     return fixture.createSnapshot()
 
-@pytest.fixture(scope="session")
-def augurInitializedWithMocksSnapshot(fixture, augurInitializedSnapshot):
+def createAugurInitializedWithMocksSnapshot(fixture, augurInitializedSnapshot):
+    fixture.resetToSnapshot(augurInitializedSnapshot)
     fixture.uploadAndAddToController("solidity_test_helpers/Constants.sol")
     fixture.uploadAllMockContracts()
     controller = fixture.contracts['Controller']
@@ -515,8 +1127,7 @@ def augurInitializedWithMocksSnapshot(fixture, augurInitializedSnapshot):
     controller.registerContract(stringToBytes('Augur'), mockAugur.address, twentyZeros, thirtyTwoZeros)
     return fixture.createSnapshot()
 
-@pytest.fixture(scope="session")
-def kitchenSinkSnapshot(fixture, augurInitializedSnapshot):
+def createKitchenSinkSnapshot(fixture, augurInitializedSnapshot):
     fixture.resetToSnapshot(augurInitializedSnapshot)
     # TODO: remove assignments to the fixture as they don't get rolled back, so can bleed across tests.  We should be accessing things via `fixture.contracts[...]`
     legacyReputationToken = fixture.contracts['LegacyReputationToken']
@@ -550,6 +1161,22 @@ def kitchenSinkSnapshot(fixture, augurInitializedSnapshot):
     snapshot['scalarMarket'] = scalarMarket
     return snapshot
 
+@pytest.fixture(scope="session")
+def controllerSnapshot(fixture, baseSnapshot):
+    return fixture.getOrCreatePersistedSnapshot('controller', lambda: createControllerSnapshot(fixture, baseSnapshot))
+
+@pytest.fixture(scope="session")
+def augurInitializedSnapshot(fixture, controllerSnapshot):
+    return fixture.getOrCreatePersistedSnapshot('augurInitialized', lambda: createAugurInitializedSnapshot(fixture, controllerSnapshot))
+
+@pytest.fixture(scope="session")
+def augurInitializedWithMocksSnapshot(fixture, augurInitializedSnapshot):
+    return fixture.getOrCreatePersistedSnapshot('augurInitializedWithMocks', lambda: createAugurInitializedWithMocksSnapshot(fixture, augurInitializedSnapshot))
+
+@pytest.fixture(scope="session")
+def kitchenSinkSnapshot(fixture, augurInitializedSnapshot):
+    return fixture.getOrCreatePersistedSnapshot('kitchenSink', lambda: createKitchenSinkSnapshot(fixture, augurInitializedSnapshot))
+
 @pytest.fixture
 def kitchenSinkFixture(fixture, kitchenSinkSnapshot):
     fixture.resetToSnapshot(kitchenSinkSnapshot)
@@ -583,6 +1210,13 @@ def categoricalMarket(kitchenSinkFixture, kitchenSinkSnapshot):
 def scalarMarket(kitchenSinkFixture, kitchenSinkSnapshot):
     return ABIContract(kitchenSinkFixture.chain, kitchenSinkSnapshot['scalarMarket'].translator, kitchenSinkSnapshot['scalarMarket'].address)
 
+# A named state from scenarios.py. Request it with @mark.parametrize('scenario', ['forkedUniverse'], indirect=True) to get the snapshot of the scenario with its contracts bound to the chain the fixture was reset to.
+@pytest.fixture
+def scenario(request, fixture):
+    snapshot = scenarios.getSnapshot(fixture, request.param, request.getfixturevalue)
+    fixture.resetToSnapshot(snapshot)
+    return bindContracts(fixture, snapshot)
+
 # TODO: globally replace this with `fixture` and `kitchenSinkSnapshot` as appropriate then delete this
 @pytest.fixture(scope="session")
 def sessionFixture(fixture, kitchenSinkSnapshot):
@@ -0,0 +1,164 @@
+#!/usr/bin/env python
+
+from collections import defaultdict
+from json import dump as json_dump, load as json_load
+from os import path, rename, getpid
+from source_profiler import SourceMap, PUSH1, PUSH32
+from storage_layout import walkAst
+
+# Bump this whenever the layout of the history file changes so old histories are ignored instead of misread
+CONTRACT_SIZE_HISTORY_VERSION = 1
+# solc appends a swarm hash of the metadata to the runtime code: a1 65 'bzzr0' 58 20 <32 bytes> 00 29
+METADATA_PREFIX = bytearray.fromhex('a165627a7a72305820')
+METADATA_LENGTH = 43
+PUSH4 = 0x63
+EQ = 0x14
+JUMPDEST = 0x5b
+
+# solc 0.4 source maps only point at source ranges, so the ranges of every function and modifier are recorded at compile time to tell which one a range is in. Entries are [start, length, fileIndex, label].
+def createFunctionRanges(sourceAsts):
+    ranges = []
+    for ast in sourceAsts:
+        for contract in walkAst(ast):
+            if contract.get('nodeType') != 'ContractDefinition': continue
+            start, length, fileIndex = [int(field) for field in contract['src'].split(':')]
+            ranges.append([start, length, fileIndex, '%s (outside functions)' % contract['name']])
+            for node in contract['nodes']:
+                if node.get('nodeType') not in ['FunctionDefinition', 'ModifierDefinition'] or not node.get('body'): continue
+                name = node['name']
+                if node.get('isConstructor') or name == contract['name']:
+                    name = 'constructor'
+                elif node.get('nodeType') == 'FunctionDefinition' and not name:
+                    name = 'fallback'
+                start, length, fileIndex = [int(field) for field in node['src'].split(':')]
+                ranges.append([start, length, fileIndex, '%s.%s' % (contract['name'], name)])
+    return ranges
+
+def getMetadataLength(bytecode):
+    if len(bytecode) >= METADATA_LENGTH and bytecode[-METADATA_LENGTH:-METADATA_LENGTH + len(METADATA_PREFIX)] == METADATA_PREFIX:
+        return METADATA_LENGTH
+    return 0
+
+# The dispatcher at the start of the code compares the selector against every external function with PUSH4 <selector> DUP EQ before jumping to it, and the first jump destination is where it falls through to the fallback
+def countDispatchEntries(bytecode):
+    count = 0
+    programCounter = 0
+    recentPush4 = None
+    while programCounter < len(bytecode):
+        opcode = bytecode[programCounter]
+        if opcode == JUMPDEST:
+            break
+        if opcode == PUSH4:
+            recentPush4 = programCounter
+        elif opcode == EQ and recentPush4 is not None and programCounter - recentPush4 <= 6:
+            count += 1
+            recentPush4 = None
+        if PUSH1 <= opcode <= PUSH32:
+            programCounter += opcode - PUSH1 + 1
+        programCounter += 1
+    return count
+
+class FunctionRangeIndex():
+
+    def __init__(self, functionRanges):
+        self.ranges = defaultdict(list)
+        for start, length, fileIndex, label in functionRanges:
+            self.ranges[fileIndex].append((start, length, label))
+        self.labels = {}
+
+    def getLabel(self, start, length, fileIndex):
+        key = (start, length, fileIndex)
+        if key not in self.labels:
+            # the innermost range wins, so code of a function isn't charged to the contract it is declared in
+            containing = [(rangeLength, label) for rangeStart, rangeLength, label in self.ranges[fileIndex] if rangeStart <= start and start + length <= rangeStart + rangeLength]
+            self.labels[key] = min(containing)[1] if containing else None
+        return self.labels[key]
+
+# Splits the deployed code of a contract into the bytes each function, modifier and piece of compiler generated code contributed. Internal functions and modifiers are charged where they are defined, even when they are inlined from a base contract or library.
+def attributeBytecode(artifact):
+    bytecode = bytearray.fromhex(artifact['deployedBytecode'])
+    metadataLength = getMetadataLength(bytecode)
+    code = bytecode[:len(bytecode) - metadataLength]
+    sourceMap = SourceMap(code, artifact['deployedSourceMap'])
+    rangeIndex = FunctionRangeIndex(artifact.get('functionRanges', []))
+    sizes = defaultdict(int)
+    programCounters = sorted(sourceMap.instructionIndexes)
+    for position, programCounter in enumerate(programCounters):
+        instructionLength = (programCounters[position + 1] if position + 1 < len(programCounters) else len(code)) - programCounter
+        instructionIndex = sourceMap.instructionIndexes[programCounter]
+        if instructionIndex < len(sourceMap.entries):
+            start, length, fileIndex = sourceMap.entries[instructionIndex]
+            label = rangeIndex.getLabel(start, length, fileIndex) if fileIndex >= 0 else '(compiler generated)'
+        else:
+            # data after the last instruction the source map covers, e.g. an INVALID padding
+            label = '(unmapped)'
+        sizes[label or '(outside any contract)'] += instructionLength
+    if metadataLength:
+        sizes['(metadata)'] += metadataLength
+    return sizes
+
+# Deployed code size of every contract per commit, so growth can be spotted before a contract crosses the limit
+class ContractSizeHistory():
+
+    def __init__(self, historyPath):
+        self.historyPath = historyPath
+        self.entries = []
+        if historyPath and path.isfile(historyPath):
+            with open(historyPath, 'r') as file:
+                history = json_load(file)
+            if history.get('version') == CONTRACT_SIZE_HISTORY_VERSION:
+                self.entries = history['entries']
+
+    def getPreviousSizes(self, commit):
+        for entry in reversed(self.entries):
+            if entry['commit'] != commit:
+                return entry['sizes']
+        return {}
+
+    def record(self, commit, sizes):
+        # running again on the same commit replaces its entry instead of piling up duplicates
+        if self.entries and self.entries[-1]['commit'] == commit:
+            self.entries.pop()
+        self.entries.append({ 'commit': commit, 'sizes': sizes })
+
+    def save(self):
+        temporaryPath = '%s.%d' % (self.historyPath, getpid())
+        with open(temporaryPath, 'w') as file:
+            json_dump({ 'version': CONTRACT_SIZE_HISTORY_VERSION, 'entries': self.entries }, file, indent=2, sort_keys=True)
+        rename(temporaryPath, self.historyPath)
+
+class ContractSizeReport():
+
+    def __init__(self, artifacts, sizeLimit, warnLevel):
+        self.artifacts = artifacts
+        self.sizeLimit = sizeLimit
+        self.warnLevel = warnLevel
+        self.sizes = dict((name, len(artifact['deployedBytecode']) // 2) for name, artifact in artifacts.items() if artifact['deployedBytecode'])
+
+    def getGrowth(self, previousSizes):
+        return dict((name, size - previousSizes[name]) for name, size in self.sizes.items() if name in previousSizes and size > previousSizes[name])
+
+    def formatSizes(self, previousSizes, count):
+        growth = self.getGrowth(previousSizes)
+        lines = ['%-40s %8s %8s %8s %10s  %s' % ('contract', 'bytes', 'limit %', 'delta', 'dispatch', 'status')]
+        for name in sorted(self.sizes, key=self.sizes.get, reverse=True)[:count]:
+            size = self.sizes[name]
+            delta = size - previousSizes[name] if name in previousSizes else 0
+            status = 'OVER LIMIT' if size >= self.sizeLimit else 'near limit' if size >= self.warnLevel else ''
+            if name in growth:
+                status = (status + ', ' if status else '') + 'GREW'
+            dispatchEntries = countDispatchEntries(bytearray.fromhex(self.artifacts[name]['deployedBytecode']))
+            lines.append('%-40s %8d %7.1f%% %+8d %10d  %s' % (name[:40], size, 100.0 * size / self.sizeLimit, delta, dispatchEntries, status))
+        return lines
+
+    # Contracts near the limit and those that grew get a breakdown of where their bytes went
+    def formatBreakdowns(self, previousSizes, count):
+        growth = self.getGrowth(previousSizes)
+        names = [name for name in sorted(self.sizes, key=self.sizes.get, reverse=True) if self.sizes[name] >= self.warnLevel or name in growth]
+        lines = []
+        for name in names:
+            sizes = attributeBytecode(self.artifacts[name])
+            lines.append('%s: %d bytes' % (name, self.sizes[name]))
+            for label in sorted(sizes, key=sizes.get, reverse=True)[:count]:
+                lines.append('  %8d %6.2f%%  %s' % (sizes[label], 100.0 * sizes[label] / self.sizes[name], label))
+        return lines
@@ -0,0 +1,106 @@
+#!/usr/bin/env python
+
+from collections import OrderedDict, defaultdict
+from hashlib import sha256
+from json import dump as json_dump, load as json_load
+from os import path, rename, getpid, makedirs
+
+# Bump this whenever the layout of the durations file changes so old files are ignored instead of misread
+DURATION_HISTORY_VERSION = 1
+# What a test nobody has timed yet is assumed to take when no test has been timed at all
+DEFAULT_TEST_SECONDS = 1.0
+
+# Seconds each test took the last time it ran, setup and teardown included, so the module fixtures a test builds count towards the test that built them
+class DurationHistory():
+
+    def __init__(self, historyPath):
+        self.historyPath = historyPath
+        self.durations = {}
+        self.measured = defaultdict(float)
+        if path.isfile(historyPath):
+            with open(historyPath, 'r') as file:
+                history = json_load(file)
+            if history.get('version') == DURATION_HISTORY_VERSION:
+                self.durations = history['durations']
+        knownDurations = sorted(self.durations.values())
+        self.defaultSeconds = knownDurations[len(knownDurations) // 2] if knownDurations else DEFAULT_TEST_SECONDS
+
+    def add(self, nodeId, seconds):
+        self.measured[nodeId] += seconds
+
+    def getSeconds(self, nodeId):
+        return self.durations.get(nodeId, self.defaultSeconds)
+
+    def save(self):
+        if not self.measured: return
+        # tests that didn't run this time (e.g. with -k) keep their last duration
+        durations = dict(self.durations)
+        durations.update(self.measured)
+        if not path.exists(path.dirname(self.historyPath)):
+            makedirs(path.dirname(self.historyPath))
+        temporaryPath = '%s.%d' % (self.historyPath, getpid())
+        with open(temporaryPath, 'w') as file:
+            json_dump({ 'version': DURATION_HISTORY_VERSION, 'durations': durations }, file, indent=2, sort_keys=True)
+        rename(temporaryPath, self.historyPath)
+
+# The tests of one module. Modules are never split up since that would build their module fixtures more than once.
+class ModuleGroup():
+
+    def __init__(self, moduleId, snapshotName):
+        self.moduleId = moduleId
+        self.snapshotName = snapshotName
+        self.items = []
+        self.seconds = 0.0
+
+# The most derived session snapshot a test needs. Tests needing the same one can share a worker's copy of it instead of every worker building or loading it.
+def getSnapshotName(item, snapshotNames):
+    fixtureNames = getattr(item, 'fixturenames', [])
+    for snapshotName in reversed(snapshotNames):
+        if snapshotName in fixtureNames:
+            return snapshotName
+    return None
+
+def groupModules(items, history, snapshotNames):
+    groups = OrderedDict()
+    for item in items:
+        moduleId = item.nodeid.split('::')[0]
+        if moduleId not in groups:
+            groups[moduleId] = ModuleGroup(moduleId, getSnapshotName(item, snapshotNames))
+        group = groups[moduleId]
+        group.items.append(item)
+        group.seconds += history.getSeconds(item.nodeid)
+    return groups.values()
+
+# Modules needing the same session snapshot run back to back, the most expensive snapshot group first and within it the longest module first, so the long tail of a run is made of short modules
+def orderModules(groups):
+    snapshotSeconds = defaultdict(float)
+    for group in groups:
+        snapshotSeconds[group.snapshotName] += group.seconds
+    return sorted(groups, key=lambda group: (-snapshotSeconds[group.snapshotName], str(group.snapshotName), -group.seconds, group.moduleId))
+
+# Longest processing time first: every module goes to the shard with the least work so far. A shard that already needs the module's snapshot is preferred as long as it doesn't end up with more work than the module would have added to the least loaded shard.
+def partitionModules(groups, shardCount):
+    shards = [[] for _ in range(shardCount)]
+    shardSeconds = [0.0] * shardCount
+    shardSnapshots = [set() for _ in range(shardCount)]
+    for group in sorted(groups, key=lambda group: (-group.seconds, group.moduleId)):
+        lightest = min(range(shardCount), key=lambda shard: (shardSeconds[shard], shard))
+        candidates = [shard for shard in range(shardCount) if group.snapshotName in shardSnapshots[shard] and shardSeconds[shard] <= shardSeconds[lightest] + group.seconds]
+        shard = min(candidates, key=lambda shard: (shardSeconds[shard], shard)) if candidates else lightest
+        shards[shard].append(group)
+        shardSeconds[shard] += group.seconds
+        shardSnapshots[shard].add(group.snapshotName)
+    return shards, shardSeconds
+
+# Without a durations file every shard agrees on, modules are spread by a hash of their id, which gives every job the same split no matter what it ran before
+def hashModules(groups, shardCount):
+    shards = [[] for _ in range(shardCount)]
+    for group in groups:
+        shards[int(sha256(group.moduleId).hexdigest(), 16) % shardCount].append(group)
+    return shards
+
+def parseShard(shard):
+    index, count = [int(part) for part in shard.split('/')]
+    if count < 1 or not 1 <= index <= count:
+        raise ValueError("a shard looks like 2/4 and has to be between 1 and the number of shards")
+    return index, count
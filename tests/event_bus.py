@@ -0,0 +1,93 @@
+#!/usr/bin/env python
+
+from collections import OrderedDict, deque
+
+# How many decoded events the bus remembers for assertions that look back at recent events
+DEFAULT_CAPACITY = 1024
+
+# Maps each event topic to the translators that know it, one per variant of the event. Filled as the fixture parses ABIs.
+eventTopics = {}
+
+# Two contracts can declare events with the same topic but different argument names or indexed arguments, and those decode differently
+def getEventVariant(eventData):
+    return (eventData['name'], tuple(eventData['names']), tuple(eventData['types']), tuple(eventData['indexed']))
+
+def registerEvents(translator):
+    for topic, eventData in translator.event_data.items():
+        eventTopics.setdefault(topic, OrderedDict()).setdefault(getEventVariant(eventData), translator)
+
+class EventSubscription():
+
+    def __init__(self, bus, translator, eventName, events):
+        self.bus = bus
+        self.translator = translator
+        self.eventName = eventName
+        self.events = events
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.unsubscribe()
+
+    def unsubscribe(self):
+        self.bus.unsubscribe(self)
+
+    def accepts(self, topic):
+        # like translator.listen, a subscription for a contract sees every log its ABI can decode, whichever contract emitted it
+        return self.translator is None or topic in self.translator.event_data
+
+# Decodes every log of a state once and hands the decoded event to whoever subscribed, so scoped subscriptions replace the listener that every capture used to leave behind on the state. The last events are kept around for assertions.
+class EventBus():
+
+    def __init__(self, capacity=DEFAULT_CAPACITY):
+        self.subscriptions = []
+        self.events = deque(maxlen=capacity)
+
+    @staticmethod
+    def forState(state):
+        for listener in state.log_listeners:
+            if EventBus.isListener(listener):
+                return listener.__self__
+        bus = EventBus()
+        state.log_listeners.append(bus.onLog)
+        return bus
+
+    @staticmethod
+    def isListener(listener):
+        return isinstance(getattr(listener, '__self__', None), EventBus)
+
+    def subscribe(self, contract=None, eventName=None, events=None):
+        subscription = EventSubscription(self, contract.translator if contract else None, eventName, events if events is not None else [])
+        self.subscriptions.append(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        if subscription in self.subscriptions:
+            self.subscriptions.remove(subscription)
+
+    def onLog(self, log):
+        if not log.topics: return
+        topic = log.topics[0]
+        decoded = {}
+        def decode(translator):
+            variant = getEventVariant(translator.event_data[topic])
+            if variant not in decoded:
+                decoded[variant] = translator.listen(log)
+            return decoded[variant]
+        variants = eventTopics.get(topic)
+        event = decode(variants.values()[0]) if variants else None
+        if event:
+            self.events.append(event)
+        for subscription in list(self.subscriptions):
+            if not subscription.accepts(topic): continue
+            subscriptionEvent = decode(subscription.translator) if subscription.translator else event
+            if not subscriptionEvent: continue
+            if subscription.eventName and subscriptionEvent['_event_type'] != subscription.eventName: continue
+            subscription.events.append(subscriptionEvent)
+
+    def getEvents(self, eventName=None):
+        return [event for event in self.events if eventName is None or event['_event_type'] == eventName]
+
+    def clear(self):
+        self.events.clear()
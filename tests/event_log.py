@@ -0,0 +1,42 @@
+#!/usr/bin/env python
+
+from ethereum.utils import encode_hex, int32
+from json import dumps as json_dumps
+from struct import pack
+
+# Events are buffered and written in batches of about this many bytes
+DEFAULT_BATCH_BYTES = 4 * 1024 * 1024
+LENGTH_PREFIX_SIZE = 4
+
+# Append only log of every event fired during a coverage run. Each record is a 4 byte big endian length followed by the event as JSON, which source/tools/eventLogReader.js streams back when generating the report.
+class EventLogWriter():
+
+    def __init__(self, logPath, batchBytes=DEFAULT_BATCH_BYTES):
+        self.logPath = logPath
+        self.batchBytes = batchBytes
+        self.records = []
+        self.bufferedBytes = 0
+        self.file = None
+
+    def write(self, log):
+        # the same encoding as log.to_dict(), which would also work out the bloom filter the coverage report doesn't look at
+        record = json_dumps({ 'address': encode_hex(log.address), 'topics': [encode_hex(int32.serialize(topic)) for topic in log.topics], 'data': '0x' + encode_hex(log.data) }, separators=(',', ':'))
+        self.records.append(pack('>I', len(record)) + record)
+        self.bufferedBytes += LENGTH_PREFIX_SIZE + len(record)
+        if self.bufferedBytes >= self.batchBytes:
+            self.flush()
+
+    def flush(self):
+        if not self.records: return
+        if not self.file:
+            self.file = open(self.logPath, 'ab')
+        self.file.write(''.join(self.records))
+        self.file.flush()
+        self.records = []
+        self.bufferedBytes = 0
+
+    def close(self):
+        self.flush()
+        if self.file:
+            self.file.close()
+            self.file = None
@@ -0,0 +1,163 @@
+#!/usr/bin/env python
+
+from ethereum.tools import tester
+from datetime import timedelta
+from ethereum.tools.tester import ABIContract, TransactionFailed
+from pytest import fixture, mark, raises
+from random import Random, randint
+from time import time
+import pytest
+from utils import longTo32Bytes
+from trade_model import settleTrade, checkSettlement, generateCase, selectReplays
+
+# numOutcomes, numTicks, creator fee divisor, reporting fee divisor of the markets the model is checked against on its own
+MODEL_MARKETS = [
+    (2, 10000, 100, 100),
+    (3, 10000, 100, 10000),
+    (8, 10000, 0, 100),
+    (2, 400000, 100, 100),
+    (5, 7, 3, 2),
+    (7, 10**18, 10**4, 10**4),
+    # fee divisors above numTicks, so the fees of a fill that sells only a few complete sets round down to zero
+    (2, 10, 10**4, 10**4),
+    (4, 3, 1000, 10**5),
+]
+# Keeps the ETH a replay needs well within what the test accounts hold
+MAX_REPLAY_AMOUNT = 10**15
+# A creator fee divisor of 10**8, so the creator fee on chain rounds down to zero whenever fewer than 10**4 complete sets of a yes/no market are sold. The kitchen sink markets have a divisor of 100, which even one complete set is worth more than.
+LOW_FEE_PER_ETH = 10**10
+
+def test_modelInvariants(tradeModelRandom):
+    caseCount = pytest.config.option.tradeModelCases
+    startTime = time()
+    for index in xrange(caseCount):
+        numOutcomes, numTicks, creatorFeeDivisor, reportingFeeDivisor = MODEL_MARKETS[index % len(MODEL_MARKETS)]
+        case = generateCase(tradeModelRandom, numOutcomes, numTicks, creatorFeeDivisor, reportingFeeDivisor, 10**30)
+        settlement = settleTrade(case)
+        violations = checkSettlement(case, settlement)
+        assert not violations, "%s breaks %s" % (case, ', '.join(violations))
+    print "Checked %d cases in %.1fs" % (caseCount, time() - startTime)
+
+@mark.parametrize('marketName', ['yesNoMarket', 'categoricalMarket', 'scalarMarket', 'lowFeeMarket'])
+def test_modelAgainstChain(request, marketName, fixture, kitchenSinkSnapshot, tradeModelRandom):
+    option = pytest.config.option
+    snapshot = request.getfixturevalue('lowFeeMarketSnapshot') if marketName == 'lowFeeMarket' else kitchenSinkSnapshot
+    fixture.resetToSnapshot(snapshot)
+    market, universe = bindMarket(fixture, snapshot, marketName)
+    numOutcomes = market.getNumberOfOutcomes()
+    numTicks = market.getNumTicks()
+    creatorFeeDivisor = market.getMarketCreatorSettlementFeeDivisor()
+    reportingFeeDivisor = universe.getOrCacheReportingFeeDivisor()
+    cases = (generateCase(tradeModelRandom, numOutcomes, numTicks, creatorFeeDivisor, reportingFeeDivisor, MAX_REPLAY_AMOUNT) for _ in xrange(option.tradeModelCases))
+    replays = selectReplays(cases, tradeModelRandom, option.tradeModelSampleRate, option.tradeModelReplays)
+    print "Replaying %d of %d cases on chain" % (len(replays), option.tradeModelCases)
+    for case, settlement, reason in replays:
+        fixture.resetToSnapshot(snapshot)
+        # a replay that mined a block leaves the next reset with a new chain, which contracts bound before it don't see
+        market, universe = bindMarket(fixture, snapshot, marketName)
+        expected = getExpectedResult(settlement)
+        observed = replayOnChain(fixture, market, universe, case, settlement.reverts)
+        differences = ['%s: model %s, chain %s' % (key, expected[key], observed.get(key)) for key in sorted(expected) if expected[key] != observed.get(key)]
+        assert not differences, "%s (%s) settles differently on chain:\n%s" % (case, reason, '\n'.join(differences))
+
+def bindMarket(fixture, snapshot, marketName):
+    market = ABIContract(fixture.chain, snapshot[marketName].translator, snapshot[marketName].address)
+    universe = ABIContract(fixture.chain, snapshot['universe'].translator, snapshot['universe'].address)
+    return market, universe
+
+def getExpectedResult(settlement):
+    if settlement.reverts:
+        return { 'reverts': True }
+    return {
+        'moneyEscrowed': settlement.moneyEscrowed,
+        'sharesEscrowed': settlement.sharesEscrowed,
+        'creatorTokens': settlement.creatorTokens,
+        'fillerTokens': settlement.fillerTokensOut - settlement.fillerTokensIn,
+        'creatorLong': settlement.creatorLong,
+        'creatorShort': settlement.creatorShort,
+        'fillerLong': settlement.fillerLong,
+        'fillerShort': settlement.fillerShort,
+        'creatorFees': settlement.creatorFees,
+        'reporterFees': settlement.reporterFees,
+        'openInterestDelta': settlement.openInterestDelta,
+        'remaining': settlement.remaining,
+        'orderAmount': settlement.orderAmount,
+        'orderMoneyEscrowed': settlement.orderMoneyEscrowed,
+        'orderSharesEscrowed': settlement.orderSharesEscrowed,
+    }
+
+# Buys complete sets and gets rid of the shares that aren't wanted, leaving the account with `long` shares of the outcome and `short` shares of every other outcome
+def acquireShares(fixture, market, outcome, long, short, key):
+    if long + short == 0: return
+    completeSets = fixture.contracts['CompleteSets']
+    assert completeSets.publicBuyCompleteSets(market.address, long + short, sender = key, value = (long + short) * market.getNumTicks())
+    for otherOutcome in range(0, market.getNumberOfOutcomes()):
+        amount = short if otherOutcome == outcome else long
+        if amount == 0: continue
+        shareToken = fixture.applySignature('ShareToken', market.getShareToken(otherOutcome))
+        assert shareToken.transfer(tester.a9, amount, sender = key)
+
+def getHoldings(fixture, market, outcome, address):
+    balances = [fixture.applySignature('ShareToken', market.getShareToken(otherOutcome)).balanceOf(address) for otherOutcome in range(0, market.getNumberOfOutcomes())]
+    return balances[outcome], min(balances[:outcome] + balances[outcome + 1:])
+
+def replayOnChain(fixture, market, universe, case, reverts):
+    orders = fixture.contracts['Orders']
+    createOrder = fixture.contracts['CreateOrder']
+    fillOrder = fixture.contracts['FillOrder']
+    cash = fixture.applySignature('Cash', market.getDenominationToken())
+    state = fixture.chain.head_state
+    numTicks = market.getNumTicks()
+    acquireShares(fixture, market, case.outcome, case.creatorLong, case.creatorShort, tester.k1)
+    acquireShares(fixture, market, case.outcome, case.fillerLong, case.fillerShort, tester.k2)
+    feeWindow = universe.getOrCreateNextFeeWindow()
+    mailbox = market.getMarketCreatorMailbox()
+    observed = {}
+
+    # more than enough ETH is sent every time so the contracts decide what is used and the rest comes back
+    creatorBalance = state.get_balance(tester.a1)
+    orderId = createOrder.publicCreateOrder(case.orderType, case.amount, case.price, market.address, case.outcome, longTo32Bytes(0), longTo32Bytes(0), "42", sender = tester.k1, value = case.amount * numTicks)
+    observed['moneyEscrowed'] = creatorBalance - state.get_balance(tester.a1)
+    observed['sharesEscrowed'] = orders.getOrderSharesEscrowed(orderId)
+
+    creatorBalance = state.get_balance(tester.a1)
+    fillerBalance = state.get_balance(tester.a2)
+    creatorFeeBalance = cash.balanceOf(mailbox)
+    reporterFeeBalance = cash.balanceOf(feeWindow)
+    openInterest = universe.getOpenInterestInAttoEth()
+    if reverts:
+        with raises(TransactionFailed):
+            fillOrder.publicFillOrder(orderId, case.fillAmount, "42", sender = tester.k2, value = case.fillAmount * numTicks)
+        return { 'reverts': True }
+    observed['remaining'] = fillOrder.publicFillOrder(orderId, case.fillAmount, "42", sender = tester.k2, value = case.fillAmount * numTicks)
+    observed['creatorTokens'] = state.get_balance(tester.a1) - creatorBalance
+    observed['fillerTokens'] = state.get_balance(tester.a2) - fillerBalance
+    observed['creatorLong'], observed['creatorShort'] = getHoldings(fixture, market, case.outcome, tester.a1)
+    observed['fillerLong'], observed['fillerShort'] = getHoldings(fixture, market, case.outcome, tester.a2)
+    observed['creatorFees'] = cash.balanceOf(mailbox) - creatorFeeBalance
+    observed['reporterFees'] = cash.balanceOf(feeWindow) - reporterFeeBalance
+    observed['openInterestDelta'] = universe.getOpenInterestInAttoEth() - openInterest
+    observed['orderAmount'] = orders.getAmount(orderId)
+    observed['orderMoneyEscrowed'] = orders.getOrderMoneyEscrowed(orderId)
+    observed['orderSharesEscrowed'] = orders.getOrderSharesEscrowed(orderId)
+    return observed
+
+@fixture
+def tradeModelRandom():
+    seed = pytest.config.option.tradeModelSeed
+    if seed is None:
+        seed = randint(0, 2**32)
+    # shows up with the output of a failing test, so the failure can be reproduced with --tradeModelSeed
+    print "Trade model seed: %d" % seed
+    return Random(seed)
+
+@fixture(scope="module")
+def lowFeeMarketSnapshot(fixture, kitchenSinkSnapshot):
+    fixture.resetToSnapshot(kitchenSinkSnapshot)
+    universe = ABIContract(fixture.chain, kitchenSinkSnapshot['universe'].translator, kitchenSinkSnapshot['universe'].address)
+    endTime = long(fixture.contracts['Time'].getTimestamp() + timedelta(days=1).total_seconds())
+    market = fixture.createYesNoMarket(universe, endTime, LOW_FEE_PER_ETH, kitchenSinkSnapshot['cash'], tester.a0)
+    snapshot = fixture.createSnapshot()
+    snapshot['universe'] = universe
+    snapshot['lowFeeMarket'] = market
+    return snapshot
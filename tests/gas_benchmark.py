@@ -0,0 +1,76 @@
+#!/usr/bin/env python
+
+from collections import OrderedDict
+from json import dump as json_dump, load as json_load
+from os import path, rename, getpid
+
+# Bump this whenever the layout of the baseline file changes so old baselines are ignored instead of misread
+GAS_BASELINE_VERSION = 1
+DEFAULT_TOLERANCE = 0.01
+# Seed entries were carried over from the constants of the old gas tests rather than measured by this benchmark, so they are only held to this until --gasBenchUpdate records a measurement
+SEED_TOLERANCE = 0.05
+
+# Recorded gas cost of every benchmark scenario. Each scenario has its own tolerance as a fraction of the recorded gas since some of them (e.g. the ones using random payouts) don't use the exact same amount on every run. Going over the tolerance fails the benchmark, coming in under it is only reported so the baseline can be lowered with --gasBenchUpdate.
+class GasBaseline():
+
+    def __init__(self, baselinePath, update):
+        self.baselinePath = baselinePath
+        self.update = update
+        self.defaultTolerance = DEFAULT_TOLERANCE
+        self.scenarios = {}
+        self.measurements = OrderedDict()
+        if path.isfile(baselinePath):
+            with open(baselinePath, 'r') as file:
+                baseline = json_load(file)
+            if baseline.get('version') == GAS_BASELINE_VERSION:
+                self.defaultTolerance = baseline.get('defaultTolerance', DEFAULT_TOLERANCE)
+                self.scenarios = baseline['scenarios']
+
+    def getGas(self, scenario):
+        return self.scenarios.get(scenario, {}).get('gas', 0)
+
+    def getTolerance(self, scenario):
+        tolerance = self.scenarios.get(scenario, {}).get('tolerance', self.defaultTolerance)
+        if self.scenarios.get(scenario, {}).get('seed'):
+            return max(tolerance, SEED_TOLERANCE)
+        return tolerance
+
+    def getUnrecordedScenarios(self):
+        return [scenario for scenario in self.measurements if not self.getGas(scenario)]
+
+    def getStatus(self, scenario, gasUsed):
+        baselineGas = self.getGas(scenario)
+        if not baselineGas:
+            return 'new'
+        allowedDelta = baselineGas * self.getTolerance(scenario)
+        if gasUsed > baselineGas + allowedDelta:
+            return 'REGRESSED'
+        if gasUsed < baselineGas - allowedDelta:
+            return 'improved'
+        return 'ok'
+
+    def check(self, scenario, gasUsed):
+        self.measurements[scenario] = gasUsed
+        if self.update: return
+        baselineGas = self.getGas(scenario)
+        assert self.getStatus(scenario, gasUsed) != 'REGRESSED', "Gas regression in %s. BASELINE: %i ACTUAL: %i (%+.2f%%, tolerance %.2f%%)" % (scenario, baselineGas, gasUsed, 100.0 * (gasUsed - baselineGas) / baselineGas, 100.0 * self.getTolerance(scenario))
+
+    def formatTable(self):
+        lines = ['%-48s %12s %12s %10s %8s  %s' % ('scenario', 'baseline', 'actual', 'delta', '%', 'status')]
+        for scenario, gasUsed in self.measurements.items():
+            baselineGas = self.getGas(scenario)
+            delta = gasUsed - baselineGas if baselineGas else 0
+            percentage = 100.0 * delta / baselineGas if baselineGas else 0
+            lines.append('%-48s %12s %12d %+10d %+7.2f%%  %s' % (scenario, baselineGas or '-', gasUsed, delta, percentage, self.getStatus(scenario, gasUsed)))
+        return lines
+
+    def save(self):
+        # Only the scenarios that ran are rewritten so a partial run (e.g. with -k) keeps the rest of the baseline and every hand tuned tolerance
+        for scenario, gasUsed in self.measurements.items():
+            self.scenarios.setdefault(scenario, {})['gas'] = gasUsed
+            self.scenarios[scenario].pop('seed', None)
+        temporaryPath = '%s.%d' % (self.baselinePath, getpid())
+        with open(temporaryPath, 'w') as file:
+            json_dump({ 'version': GAS_BASELINE_VERSION, 'defaultTolerance': self.defaultTolerance, 'scenarios': self.scenarios }, file, indent=4, sort_keys=True, separators=(',', ': '))
+            file.write('\n')
+        rename(temporaryPath, self.baselinePath)
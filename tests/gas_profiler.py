@@ -0,0 +1,117 @@
+#!/usr/bin/env python
+
+from binascii import hexlify
+from collections import OrderedDict
+from os import path, makedirs
+from re import sub
+from ethereum import messages
+from ethereum.utils import normalize_address
+from vm_trace import CodeIndex
+
+class GasProfileNode():
+
+    def __init__(self, label):
+        self.label = label
+        self.calls = 0
+        self.inclusiveGas = 0
+        self.childGas = 0
+        self.children = OrderedDict()
+
+    def getChild(self, label):
+        if label not in self.children:
+            self.children[label] = GasProfileNode(label)
+        return self.children[label]
+
+    def exclusiveGas(self):
+        return self.inclusiveGas - self.childGas
+
+# Hooks pyethereum's message execution while active and records a tree of call frames. Frames with the same contract and function under the same parent are merged, so a loop over 100 orders shows up as one node with 100 calls.
+class GasProfiler():
+
+    def __init__(self, fixture, action, originalGas=0):
+        self.fixture = fixture
+        self.action = action
+        self.originalGas = originalGas
+        self.root = GasProfileNode(action)
+
+    def __enter__(self):
+        self.addressNames = {}
+        for name, contract in self.fixture.contracts.toSnapshot().items():
+            self.addressNames[normalize_address(contract['address'])] = name
+        # the same index the source and storage profilers use, which also picks up artifacts loaded while the block runs
+        self.codeIndex = CodeIndex(self.fixture.artifacts)
+        self.stack = [self.root]
+        self.startingGas = self.fixture.chain.head_state.gas_used
+        self.originalApplyMsg = messages._apply_msg
+        messages._apply_msg = self.applyMsg
+        return self
+
+    def __exit__(self, *args):
+        messages._apply_msg = self.originalApplyMsg
+        if args[1]:
+            raise args[1]
+        self.root.calls = 1
+        self.root.inclusiveGas = self.fixture.chain.head_state.gas_used - self.startingGas
+        if self.originalGas:
+            print "GAS USED WITH %s : %i. ORIGINAL: %i DELTA: %i" % (self.action, self.root.inclusiveGas, self.originalGas, self.originalGas - self.root.inclusiveGas)
+        else:
+            print "GAS USED WITH %s : %i" % (self.action, self.root.inclusiveGas)
+        print self.formatTree()
+        if self.fixture.gasProfileDirectory:
+            self.writeCollapsedStacks(path.join(self.fixture.gasProfileDirectory, sub('[^A-Za-z0-9_.-]', '_', self.action) + '.folded'))
+
+    def applyMsg(self, ext, msg, code):
+        node = self.stack[-1].getChild(self.getLabel(ext, msg, code))
+        self.stack.append(node)
+        try:
+            result, gasRemaining, data = self.originalApplyMsg(ext, msg, code)
+        finally:
+            self.stack.pop()
+        gasUsed = msg.gas - gasRemaining
+        node.calls += 1
+        node.inclusiveGas += gasUsed
+        self.stack[-1].childGas += gasUsed
+        return result, gasRemaining, data
+
+    def getContractName(self, ext, address):
+        if address in self.addressNames:
+            return self.addressNames[address]
+        # contracts created on chain (markets, universes, fee windows...) aren't in fixture.contracts but their code is one of our artifacts
+        return self.codeIndex.lookup(ext.get_code(address))[0] or '0x' + hexlify(address)
+
+    def getLabel(self, ext, msg, code):
+        if msg.is_create:
+            return (self.codeIndex.lookup(code)[0] or '0x' + hexlify(msg.to)) + '.constructor'
+        contractName = self.getContractName(ext, msg.code_address)
+        callData = msg.data.extract_all()
+        if len(callData) < 4:
+            return contractName + '.fallback'
+        selector = int(hexlify(callData[:4]), 16)
+        return contractName + '.' + self.fixture.functionSelectors.get(selector, '0x%08x' % selector)
+
+    def formatTree(self):
+        lines = ['%12s %12s %7s  %s' % ('inclusive', 'exclusive', '%', 'frame')]
+        self.formatNode(self.root, 0, lines)
+        return '\n'.join(lines)
+
+    def formatNode(self, node, depth, lines):
+        percentage = 100.0 * node.inclusiveGas / self.root.inclusiveGas if self.root.inclusiveGas else 0
+        lines.append('%12d %12d %6.2f%%  %s%s x%d' % (node.inclusiveGas, node.exclusiveGas(), percentage, '  ' * depth, node.label, node.calls))
+        for child in node.children.values():
+            self.formatNode(child, depth + 1, lines)
+
+    # Brendan Gregg's collapsed stack format, one line per frame with its exclusive gas. Feed it to flamegraph.pl to get a flame graph.
+    def writeCollapsedStacks(self, outputPath):
+        if not path.exists(path.dirname(outputPath)):
+            makedirs(path.dirname(outputPath))
+        lines = []
+        self.collapseNode(self.root, [], lines)
+        with open(outputPath, 'w') as file:
+            file.write('\n'.join(lines) + '\n')
+
+    def collapseNode(self, node, stack, lines):
+        stack = stack + [node.label.replace(';', ':').replace(' ', '_')]
+        if node.exclusiveGas() > 0:
+            lines.append('%s %d' % (';'.join(stack), node.exclusiveGas()))
+        for child in node.children.values():
+            self.collapseNode(child, stack, lines)
@@ -0,0 +1,82 @@
+#!/usr/bin/env python
+
+from hashlib import sha256
+from json import dump as json_dump, load as json_load
+from os import path, stat, rename, getpid
+from re import findall
+
+# Bump this whenever the parsing rules or the entry layout change so old indexes are thrown away
+IMPORT_GRAPH_VERSION = 1
+
+# On-disk index of the direct dependencies and content hash of every contract source file. A file is only re-read when its size or mtime changed since it was indexed, and only re-parsed when its content hash changed. Paths are stored relative to the repository root so the index stays valid in any checkout.
+class ImportGraph():
+
+    def __init__(self, indexPath, repositoryRoot, contractsPath, testContractsPath):
+        self.indexPath = indexPath
+        self.repositoryRoot = repositoryRoot
+        self.contractsPath = contractsPath
+        self.testContractsPath = testContractsPath
+        self.entries = {}
+        self.checked = set()
+        self.dirty = False
+        if path.isfile(indexPath):
+            with open(indexPath, 'r') as file:
+                index = json_load(file)
+            if index.get('version') == IMPORT_GRAPH_VERSION:
+                self.entries = index['entries']
+
+    def getEntry(self, filePath):
+        key = path.relpath(filePath, self.repositoryRoot)
+        if key in self.checked:
+            return self.entries[key]
+        fileStat = stat(filePath)
+        entry = self.entries.get(key)
+        if not entry or entry['mtime'] != fileStat.st_mtime or entry['size'] != fileStat.st_size:
+            with open(filePath, 'r') as file:
+                fileContents = file.read()
+            contentHash = sha256(fileContents).hexdigest()
+            if not entry or entry['hash'] != contentHash:
+                dependencies = [path.relpath(dependencyPath, self.repositoryRoot) for dependencyPath in self.parseDependencies(filePath, fileContents)]
+                entry = { 'hash': contentHash, 'dependencies': dependencies }
+            entry['mtime'] = fileStat.st_mtime
+            entry['size'] = fileStat.st_size
+            self.entries[key] = entry
+            self.dirty = True
+        self.checked.add(key)
+        return entry
+
+    def parseDependencies(self, filePath, fileContents):
+        dependencies = []
+        fileDirectory = path.dirname(filePath)
+        for match in findall("inset\('(.*?)'\)", fileContents) + findall("create\('(.*?)'\)", fileContents):
+            dependencies.append(path.abspath(path.join(fileDirectory, match)))
+        for match in findall("import ['\"](.*?)['\"]", fileContents):
+            dependencyPath = path.join(self.contractsPath, match)
+            if "TEST" in dependencyPath:
+                dependencyPath = path.join(self.testContractsPath, match).replace("TEST/", "")
+            if not path.isfile(dependencyPath):
+                raise Exception("Could not resolve dependency file path: %s" % dependencyPath)
+            dependencies.append(path.abspath(dependencyPath))
+        return dependencies
+
+    def getHash(self, filePath):
+        return self.getEntry(filePath)['hash']
+
+    def getAllDependencies(self, filePath, knownDependencies):
+        pending = [path.abspath(filePath)]
+        while pending:
+            filePath = pending.pop()
+            if filePath in knownDependencies: continue
+            knownDependencies.add(filePath)
+            for dependency in self.getEntry(filePath)['dependencies']:
+                pending.append(path.join(self.repositoryRoot, dependency))
+        return knownDependencies
+
+    def save(self):
+        if not self.dirty: return
+        # Write to a temporary file and rename it over the index so a concurrent reader never sees a partial index
+        temporaryPath = '%s.%d' % (self.indexPath, getpid())
+        with open(temporaryPath, 'w') as file:
+            json_dump({ 'version': IMPORT_GRAPH_VERSION, 'entries': self.entries }, file)
+        rename(temporaryPath, self.indexPath)
+        self.dirty = False
@@ -0,0 +1,263 @@
+#!/usr/bin/env python
+
+from collections import OrderedDict
+from ethereum.tools import tester
+from ethereum.tools.tester import TransactionFailed
+from json import dump as json_dump
+from random import Random
+from time import time
+from constants import BID, ASK, LONG, SHORT
+from utils import longTo32Bytes, longToHexString
+
+MARKET_KINDS = ['yesNo', 'categorical', 'scalar']
+# How often each kind of operation is picked relative to the others
+DEFAULT_OPERATION_WEIGHTS = OrderedDict([
+    ('createOrder', 30),
+    ('fillOrder', 20),
+    ('cancelOrder', 10),
+    ('publicTrade', 20),
+    ('buyCompleteSets', 10),
+    ('sellCompleteSets', 10),
+])
+# Order and trade sizes are a random multiple of this many attoshares
+SHARE_UNIT = 10**12
+
+def percentile(values, fraction):
+    if not values: return 0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+class LoadProfile():
+
+    def __init__(self, seed=0, universes=1, marketsPerStage=None, traders=4, operationsPerStage=200, stages=4, operationWeights=None):
+        self.seed = seed
+        self.universes = universes
+        # markets of every kind created at the start of each stage
+        self.marketsPerStage = marketsPerStage or { 'yesNo': 4, 'categorical': 2, 'scalar': 2 }
+        self.traders = traders
+        self.operationsPerStage = operationsPerStage
+        self.stages = stages
+        self.operationWeights = operationWeights or DEFAULT_OPERATION_WEIGHTS
+
+    @staticmethod
+    def fromOptions(option):
+        marketCounts = [int(count) for count in option.loadMarkets.split(',')]
+        if len(marketCounts) != len(MARKET_KINDS):
+            raise ValueError("--loadMarkets takes the number of %s markets per stage" % ', '.join(MARKET_KINDS))
+        return LoadProfile(option.loadSeed, option.loadUniverses, dict(zip(MARKET_KINDS, marketCounts)), option.loadTraders, option.loadOperations, option.loadStages)
+
+class OperationStats():
+
+    def __init__(self):
+        self.gas = []
+        self.seconds = 0.0
+        self.failures = 0
+
+    def toDict(self):
+        return { 'count': len(self.gas), 'failures': self.failures, 'seconds': self.seconds, 'meanGas': sum(self.gas) // len(self.gas) if self.gas else 0, 'p50Gas': percentile(self.gas, 0.5), 'p90Gas': percentile(self.gas, 0.9), 'p99Gas': percentile(self.gas, 0.99) }
+
+class StageStats():
+
+    def __init__(self, stage):
+        self.stage = stage
+        self.markets = 0
+        self.openOrders = 0
+        self.transactions = 0
+        self.seconds = 0.0
+        self.operations = OrderedDict()
+
+    def getTransactionsPerSecond(self):
+        return self.transactions / self.seconds if self.seconds else 0.0
+
+class OpenOrder():
+
+    def __init__(self, orderId, market, creator):
+        self.orderId = orderId
+        self.market = market
+        self.creator = creator
+
+# Drives a mixed trading and reporting workload against the kitchen sink state with a seeded random number generator, so a run can be repeated exactly. The workload runs in stages that each add markets before trading on all of them, so the stats of successive stages show how throughput and gas change as the number of markets and the order book grow. Reporting, finalization and claims run once for every market at the end.
+class LoadGenerator():
+
+    def __init__(self, fixture, universe, cash, profile):
+        self.fixture = fixture
+        self.profile = profile
+        self.random = Random(profile.seed)
+        self.cash = cash
+        self.universes = [universe]
+        self.traders = [getattr(tester, 'k%d' % (index + 1)) for index in range(profile.traders)]
+        self.markets = []
+        self.openOrders = []
+        self.completeSets = {}
+        self.stages = []
+        self.stage = None
+
+    def run(self):
+        for _ in range(1, self.profile.universes):
+            universe = self.fixture.createUniverse()
+            # every universe gets its REP from the legacy balance of tester 0, which creates all the markets
+            self.fixture.distributeRep(universe)
+            self.universes.append(universe)
+        for stage in range(self.profile.stages):
+            self.startStage(stage)
+            for kind in MARKET_KINDS:
+                for _ in range(self.profile.marketsPerStage.get(kind, 0)):
+                    self.measure('create%sMarket' % (kind[0].upper() + kind[1:]), lambda: self.createMarket(kind))
+            for _ in range(self.profile.operationsPerStage if self.markets else 0):
+                self.runOperation(self.pickOperation())
+            self.endStage()
+        self.startStage('reporting')
+        self.reportAndClaim()
+        self.endStage()
+
+    def startStage(self, stage):
+        self.stage = StageStats(stage)
+        self.stageStartTime = time()
+
+    def endStage(self):
+        self.stage.seconds = time() - self.stageStartTime
+        self.stage.markets = len(self.markets)
+        self.stage.openOrders = len(self.openOrders)
+        self.stages.append(self.stage)
+
+    # Runs one operation and charges its gas and wall time to the operation. An operation that finds nothing to do returns False and isn't counted. Some operations send more than one transaction (creating a market also caches the creation cost first), so the stage counts the receipts the operations added rather than the operations.
+    def measure(self, name, operation):
+        stats = self.stage.operations.setdefault(name, OperationStats())
+        startingGas = self.fixture.chain.head_state.gas_used
+        startingReceipts = len(self.fixture.chain.head_state.receipts)
+        startTime = time()
+        try:
+            result = operation()
+        except TransactionFailed:
+            stats.failures += 1
+            return None
+        finally:
+            elapsed = time() - startTime
+            # failed transactions were sent all the same and get a receipt too
+            self.stage.transactions += len(self.fixture.chain.head_state.receipts) - startingReceipts
+        if result is False: return None
+        stats.gas.append(self.fixture.chain.head_state.gas_used - startingGas)
+        stats.seconds += elapsed
+        return result
+
+    def pickOperation(self):
+        total = sum(self.profile.operationWeights.values())
+        choice = self.random.uniform(0, total)
+        for name, weight in self.profile.operationWeights.items():
+            choice -= weight
+            if choice <= 0:
+                return name
+        return name
+
+    def runOperation(self, name):
+        self.measure(name, getattr(self, name))
+
+    def createMarket(self, kind):
+        universe = self.random.choice(self.universes)
+        if kind == 'yesNo':
+            market = self.fixture.createReasonableYesNoMarket(universe, self.cash)
+        elif kind == 'categorical':
+            market = self.fixture.createReasonableCategoricalMarket(universe, self.random.randint(3, 8), self.cash)
+        else:
+            market = self.fixture.createReasonableScalarMarket(universe, 30, -10, 400000, self.cash)
+        self.markets.append((market, market.getNumTicks(), market.getNumberOfOutcomes()))
+
+    def pickMarket(self):
+        return self.random.choice(self.markets)
+
+    def createOrder(self):
+        market, numTicks, numberOfOutcomes = self.pickMarket()
+        trader = self.random.choice(self.traders)
+        amount = self.random.randint(1, 100) * SHARE_UNIT
+        price = self.random.randint(1, numTicks - 1)
+        orderType = self.random.choice([BID, ASK])
+        orderId = self.fixture.contracts['CreateOrder'].publicCreateOrder(orderType, amount, price, market.address, self.random.randrange(numberOfOutcomes), longTo32Bytes(0), longTo32Bytes(0), "42", sender=trader, value=amount * numTicks)
+        self.openOrders.append(OpenOrder(orderId, market, trader))
+
+    # Orders also get filled by publicTrade, so the book is checked before an order is used
+    def pickOpenOrder(self):
+        orders = self.fixture.contracts['Orders']
+        while self.openOrders:
+            order = self.random.choice(self.openOrders)
+            if orders.getAmount(order.orderId):
+                return order
+            self.openOrders.remove(order)
+        return None
+
+    def fillOrder(self):
+        order = self.pickOpenOrder()
+        if not order: return False
+        filler = self.random.choice([trader for trader in self.traders if trader != order.creator] or self.traders)
+        amount = self.random.randint(1, 100) * SHARE_UNIT
+        self.fixture.contracts['FillOrder'].publicFillOrder(order.orderId, amount, "42", sender=filler, value=amount * order.market.getNumTicks())
+
+    def cancelOrder(self):
+        order = self.pickOpenOrder()
+        if not order: return False
+        self.fixture.contracts['CancelOrder'].cancelOrder(order.orderId, sender=order.creator)
+        self.openOrders.remove(order)
+
+    def publicTrade(self):
+        market, numTicks, numberOfOutcomes = self.pickMarket()
+        trader = self.random.choice(self.traders)
+        amount = self.random.randint(1, 100) * SHARE_UNIT
+        # whatever doesn't get filled is left on the book as a new order
+        orderId = self.fixture.contracts['Trade'].publicTrade(self.random.choice([LONG, SHORT]), market.address, self.random.randrange(numberOfOutcomes), amount, self.random.randint(1, numTicks - 1), longTo32Bytes(0), longTo32Bytes(0), "42", sender=trader, value=amount * numTicks)
+        if orderId and orderId != longTo32Bytes(0):
+            self.openOrders.append(OpenOrder(orderId, market, trader))
+
+    def buyCompleteSets(self):
+        market, numTicks, numberOfOutcomes = self.pickMarket()
+        trader = self.random.choice(self.traders)
+        amount = self.random.randint(1, 100) * SHARE_UNIT
+        assert self.fixture.contracts['CompleteSets'].publicBuyCompleteSets(market.address, amount, sender=trader, value=amount * numTicks)
+        self.completeSets[(market.address, trader)] = self.completeSets.get((market.address, trader), 0) + amount
+
+    def sellCompleteSets(self):
+        holdings = [key for key, amount in self.completeSets.items() if amount]
+        if not holdings: return False
+        marketAddress, trader = self.random.choice(sorted(holdings))
+        amount = self.random.randint(1, self.completeSets[(marketAddress, trader)] // SHARE_UNIT) * SHARE_UNIT
+        # the shares may have been sold on the book since, so only count the sale as done once it went through
+        assert self.fixture.contracts['CompleteSets'].publicSellCompleteSets(marketAddress, amount, sender=trader)
+        self.completeSets[(marketAddress, trader)] -= amount
+
+    def reportAndClaim(self):
+        if not self.markets: return
+        timeContract = self.fixture.contracts['Time']
+        claimTradingProceeds = self.fixture.contracts['ClaimTradingProceeds']
+        timeContract.setTimestamp(max(market.getEndTime() for market, _, _ in self.markets) + 1)
+        for market, numTicks, numberOfOutcomes in self.markets:
+            payoutNumerators = [0] * numberOfOutcomes
+            payoutNumerators[self.random.randrange(numberOfOutcomes)] = numTicks
+            self.measure('doInitialReport', lambda: market.doInitialReport(payoutNumerators, False))
+        feeWindows = set(market.getFeeWindow() for market, _, _ in self.markets) - set([longToHexString(0)])
+        if feeWindows:
+            timeContract.setTimestamp(max(self.fixture.applySignature('FeeWindow', feeWindow).getEndTime() for feeWindow in feeWindows) + 1)
+        for market, _, _ in self.markets:
+            self.measure('finalize', lambda: market.finalize())
+        # claims are only paid out after the waiting period
+        timeContract.incrementTimestamp(3 * 24 * 60 * 60 + 1)
+        for market, _, _ in self.markets:
+            for trader in self.traders:
+                self.measure('claimTradingProceeds', lambda: claimTradingProceeds.claimTradingProceeds(market.address, tester.privtoaddr(trader)))
+
+    def formatReport(self):
+        lines = ['%-12s %8s %12s %8s %10s %10s' % ('stage', 'markets', 'open orders', 'tx', 'seconds', 'tx/s')]
+        for stage in self.stages:
+            lines.append('%-12s %8d %12d %8d %10.2f %10.2f' % (stage.stage, stage.markets, stage.openOrders, stage.transactions, stage.seconds, stage.getTransactionsPerSecond()))
+        lines.append('')
+        lines.append('%-12s %-24s %6s %6s %10s %10s %10s %10s' % ('stage', 'operation', 'count', 'failed', 'mean gas', 'p50 gas', 'p90 gas', 'p99 gas'))
+        for stage in self.stages:
+            for name, stats in stage.operations.items():
+                summary = stats.toDict()
+                lines.append('%-12s %-24s %6d %6d %10d %10d %10d %10d' % (stage.stage, name, summary['count'], summary['failures'], summary['meanGas'], summary['p50Gas'], summary['p90Gas'], summary['p99Gas']))
+        return lines
+
+    def writeReport(self, outputPath):
+        report = {
+            'seed': self.profile.seed,
+            'stages': [{ 'stage': stage.stage, 'markets': stage.markets, 'openOrders': stage.openOrders, 'transactions': stage.transactions, 'seconds': stage.seconds, 'transactionsPerSecond': stage.getTransactionsPerSecond(), 'operations': dict((name, stats.toDict()) for name, stats in stage.operations.items()) } for stage in self.stages],
+        }
+        with open(outputPath, 'w') as file:
+            json_dump(report, file, indent=2, sort_keys=True)
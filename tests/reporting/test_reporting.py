@@ -481,8 +481,10 @@ def test_fee_window_record_keeping(localFixture, universe, cash, market, categor
     assert feeWindow.getNumMarkets() == 3 if localFixture.subFork else 1
     assert feeWindow.getNumDesignatedReportNoShows() == 1
 
-def test_rep_migration_convenience_function(localFixture, universe, market):
-    proceedToFork(localFixture, market, universe)
+@mark.parametrize('scenario', ['forkedUniverse'], indirect=True)
+def test_rep_migration_convenience_function(fixture, scenario):
+    universe = scenario['universe']
+    market = scenario['yesNoMarket']
 
     payoutNumerators = [1, market.getNumTicks()-1]
     payoutDistributionHash = market.derivePayoutDistributionHash(payoutNumerators, False)
@@ -491,7 +493,7 @@ def test_rep_migration_convenience_function(localFixture, universe, market):
     assert universe.getChildUniverse(payoutDistributionHash) == longToHexString(0)
 
     # We'll use the convenience function for migrating REP instead of manually creating a child universe
-    reputationToken = localFixture.applySignature("ReputationToken", universe.getReputationToken())
+    reputationToken = fixture.applySignature("ReputationToken", universe.getReputationToken())
 
     with raises(TransactionFailed):
         reputationToken.migrateOutByPayout(payoutNumerators, False, 0)
@@ -499,9 +501,9 @@ def test_rep_migration_convenience_function(localFixture, universe, market):
     assert reputationToken.migrateOutByPayout(payoutNumerators, False, 10)
 
     # We can see that the child universe was created
-    newUniverse = localFixture.applySignature("Universe", universe.getChildUniverse(payoutDistributionHash))
-    newReputationToken = localFixture.applySignature("ReputationToken", newUniverse.getReputationToken())
-    bonus = 10 / localFixture.contracts["Constants"].FORK_MIGRATION_PERCENTAGE_BONUS_DIVISOR()
+    newUniverse = fixture.applySignature("Universe", universe.getChildUniverse(payoutDistributionHash))
+    newReputationToken = fixture.applySignature("ReputationToken", newUniverse.getReputationToken())
+    bonus = 10 / fixture.contracts["Constants"].FORK_MIGRATION_PERCENTAGE_BONUS_DIVISOR()
     assert newReputationToken.balanceOf(tester.a0) == 10 + bonus
 
 @fixture(scope="session")
@@ -55,12 +55,64 @@ def proceedToNextRound(fixture, market, contributor = tester.k0, doGenerateFees
         fixture.contracts["Time"].setTimestamp(feeWindow.getStartTime() + 1)
 
 def proceedToFork(fixture, market, universe):
-    while (market.getForkingMarket() == longToHexString(0)):
-        proceedToNextRound(fixture, market)
-
-    for i in range(market.getNumParticipants()):
-        reportingParticipant = fixture.applySignature("DisputeCrowdsourcer", market.getReportingParticipant(i))
-        reportingParticipant.forkAndRedeem()
+    DisputeFastForward(fixture).proceedToFork(market, universe)
+
+class DisputeRound():
+
+    def __init__(self, timestamp, payoutNumerators, amount):
+        self.timestamp = timestamp
+        self.payoutNumerators = payoutNumerators
+        self.amount = amount
+
+# Drives a market to a fork without asking the chain what to do every round. Every dispute round of a yes/no dispute is worked out up front from the stakes as they are when it starts: the size of a round is 2 * participant stake - 3 * stake in the outcome disputed, filling it makes that outcome the tentative winner with twice the stake of the other one, and the market moves to the next fee window. The first round whose size reaches the fork threshold forks the universe. Running the schedule then only takes a setTimestamp and a contribute per round. Forks that several tests start from aren't cached here; they are named scenarios in scenarios.py (forkedUniverse and the ones built on it), which keep each fork as a snapshot for the session.
+class DisputeFastForward():
+
+    def __init__(self, fixture, contributor = tester.k0):
+        self.fixture = fixture
+        self.contributor = contributor
+
+    def getSchedule(self, market, universe):
+        noPayoutNumerators = [0] * market.getNumberOfOutcomes()
+        noPayoutNumerators[0] = market.getNumTicks()
+        yesPayoutNumerators = noPayoutNumerators[::-1]
+        noPayoutHash = market.derivePayoutDistributionHash(noPayoutNumerators, False)
+        yesPayoutHash = market.derivePayoutDistributionHash(yesPayoutNumerators, False)
+        winningPayoutHash = self.fixture.applySignature('DisputeCrowdsourcer', market.getWinningReportingParticipant()).getPayoutDistributionHash()
+        participantStake = market.getParticipantStake()
+        stakes = { noPayoutHash: market.getStakeInOutcome(noPayoutHash), yesPayoutHash: market.getStakeInOutcome(yesPayoutHash) }
+        disputeThresholdForFork = universe.getDisputeThresholdForFork()
+        roundDuration = universe.getDisputeRoundDurationInSeconds()
+        timestamp = self.fixture.applySignature('FeeWindow', market.getFeeWindow()).getStartTime() + 1
+        schedule = []
+        while True:
+            # like proceedToNextRound, dispute the first outcome unless it is the tentative winner
+            payoutHash, payoutNumerators = (noPayoutHash, noPayoutNumerators) if winningPayoutHash != noPayoutHash else (yesPayoutHash, yesPayoutNumerators)
+            amount = 2 * participantStake - 3 * stakes[payoutHash]
+            schedule.append(DisputeRound(timestamp, payoutNumerators, amount))
+            if amount >= disputeThresholdForFork:
+                return schedule
+            participantStake += amount
+            stakes[payoutHash] += amount
+            winningPayoutHash = payoutHash
+            # the next fee window starts right after the one the round was filled in
+            timestamp += roundDuration
+
+    def execute(self, market, schedule):
+        time = self.fixture.contracts["Time"]
+        for disputeRound in schedule:
+            time.setTimestamp(disputeRound.timestamp)
+            market.contribute(disputeRound.payoutNumerators, False, disputeRound.amount, sender=self.contributor)
+
+    def proceedToFork(self, market, universe):
+        if market.getForkingMarket() == longToHexString(0):
+            # the initial report is the one round that isn't a dispute
+            if market.getFeeWindow() == longToHexString(0):
+                proceedToNextRound(self.fixture, market, self.contributor)
+            self.execute(market, self.getSchedule(market, universe))
+            assert market.getForkingMarket() != longToHexString(0), "The dispute schedule ran out without forking the market"
+        for i in range(market.getNumParticipants()):
+            reportingParticipant = self.fixture.applySignature("DisputeCrowdsourcer", market.getReportingParticipant(i))
+            reportingParticipant.forkAndRedeem()
 
 def finalizeFork(fixture, market, universe, finalizeByMigration = True):
     reputationToken = fixture.applySignature('ReputationToken', universe.getReputationToken())
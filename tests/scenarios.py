@@ -0,0 +1,133 @@
+#!/usr/bin/env python
+
+from collections import OrderedDict
+from ethereum.tools.tester import ABIContract
+from time import time
+from reporting_utils import proceedToDesignatedReporting, proceedToInitialReporting, proceedToNextRound, DisputeFastForward, finalizeFork, generateFees
+
+class Scenario():
+
+    def __init__(self, name, parent, build):
+        self.name = name
+        self.parent = parent
+        self.build = build
+        self.snapshot = None
+        self.seconds = None
+
+# Contracts in a snapshot are bound to the chain that was current when it was made, so they are bound to the fixture's chain again whenever the snapshot is used
+def bindContracts(fixture, snapshot):
+    bound = dict(snapshot)
+    for key, value in snapshot.items():
+        if isinstance(value, ABIContract):
+            bound[key] = ABIContract(fixture.chain, value.translator, value.address)
+    return bound
+
+# Named chain states that take a lot of transactions to reach. Every scenario is built from its parent scenario the first time a test asks for it and then kept as a snapshot for the rest of the session. Scenarios without a parent come from a session snapshot fixture.
+class ScenarioRegistry():
+
+    def __init__(self):
+        self.scenarios = OrderedDict()
+
+    def addFixtureScenario(self, name, fixtureName):
+        self.scenarios[name] = Scenario(name, None, lambda fixture, state, getFixtureValue: getFixtureValue(fixtureName))
+
+    # Decorates build(fixture, state), which gets the chain reset to the parent scenario and its contracts in state. Anything it returns is added to state and kept in the snapshot of the scenario.
+    def scenario(self, name, parent):
+        def register(build):
+            if parent not in self.scenarios:
+                raise Exception("Scenario %s is based on %s, which isn't registered (yet)" % (name, parent))
+            self.scenarios[name] = Scenario(name, parent, lambda fixture, state, getFixtureValue: self.buildSnapshot(fixture, state, build))
+            return build
+        return register
+
+    def buildSnapshot(self, fixture, state, build):
+        additions = build(fixture, state) or {}
+        snapshot = fixture.createSnapshot()
+        for key, value in state.items():
+            if key not in snapshot:
+                snapshot[key] = value
+        snapshot.update(additions)
+        return snapshot
+
+    def getSnapshot(self, fixture, name, getFixtureValue):
+        if name not in self.scenarios:
+            raise Exception("There is no scenario named %s. Known scenarios:\n%s" % (name, '\n'.join(self.formatGraph())))
+        scenario = self.scenarios[name]
+        if scenario.snapshot is None:
+            state = None
+            if scenario.parent:
+                parentSnapshot = self.getSnapshot(fixture, scenario.parent, getFixtureValue)
+                fixture.resetToSnapshot(parentSnapshot)
+                state = bindContracts(fixture, parentSnapshot)
+            startTime = time()
+            try:
+                scenario.snapshot = scenario.build(fixture, state, getFixtureValue)
+            except Exception as error:
+                raise Exception("Building scenario %s failed: %s" % (' -> '.join(self.getPath(name)), error))
+            scenario.seconds = time() - startTime
+        return scenario.snapshot
+
+    def getPath(self, name):
+        path = []
+        while name:
+            path.insert(0, name)
+            name = self.scenarios[name].parent
+        return path
+
+    # The scenarios as a tree, with how long the ones built in this session took
+    def formatGraph(self):
+        children = OrderedDict((name, []) for name in self.scenarios)
+        roots = []
+        for scenario in self.scenarios.values():
+            if scenario.parent:
+                children[scenario.parent].append(scenario.name)
+            else:
+                roots.append(scenario.name)
+        lines = []
+        def addLines(name, depth):
+            scenario = self.scenarios[name]
+            status = 'built in %.2fs' % scenario.seconds if scenario.snapshot is not None else 'not built'
+            lines.append('%s%s (%s)' % ('  ' * depth, name, status))
+            for child in children[name]:
+                addLines(child, depth + 1)
+        for root in roots:
+            addLines(root, 0)
+        return lines
+
+scenarios = ScenarioRegistry()
+scenarios.addFixtureScenario('kitchenSink', 'kitchenSinkSnapshot')
+
+@scenarios.scenario('marketInDesignatedReporting', parent='kitchenSink')
+def buildMarketInDesignatedReporting(fixture, state):
+    proceedToDesignatedReporting(fixture, state['yesNoMarket'])
+
+@scenarios.scenario('marketInInitialReporting', parent='kitchenSink')
+def buildMarketInInitialReporting(fixture, state):
+    proceedToInitialReporting(fixture, state['yesNoMarket'])
+
+@scenarios.scenario('marketWithInitialReport', parent='kitchenSink')
+def buildMarketWithInitialReport(fixture, state):
+    proceedToNextRound(fixture, state['yesNoMarket'])
+
+@scenarios.scenario('marketAfterOneDisputeRound', parent='marketWithInitialReport')
+def buildMarketAfterOneDisputeRound(fixture, state):
+    proceedToNextRound(fixture, state['yesNoMarket'])
+
+@scenarios.scenario('marketAfterTwoDisputeRounds', parent='marketAfterOneDisputeRound')
+def buildMarketAfterTwoDisputeRounds(fixture, state):
+    proceedToNextRound(fixture, state['yesNoMarket'])
+
+@scenarios.scenario('marketWithFees', parent='kitchenSink')
+def buildMarketWithFees(fixture, state):
+    generateFees(fixture, state['universe'], state['yesNoMarket'])
+
+@scenarios.scenario('forkedUniverse', parent='kitchenSink')
+def buildForkedUniverse(fixture, state):
+    DisputeFastForward(fixture).proceedToFork(state['yesNoMarket'], state['universe'])
+
+@scenarios.scenario('forkFinalizedByMigration', parent='forkedUniverse')
+def buildForkFinalizedByMigration(fixture, state):
+    market = state['yesNoMarket']
+    universe = state['universe']
+    finalizeFork(fixture, market, universe)
+    return { 'winningUniverse': fixture.applySignature('Universe', universe.getChildUniverse(market.getWinningPayoutDistributionHash())) }
@@ -0,0 +1,82 @@
+#!/usr/bin/env python
+
+from collections import OrderedDict, defaultdict
+from json import dump as json_dump
+from time import time
+
+class TimedPhase():
+
+    def __init__(self, timer, name, contractName):
+        self.timer = timer
+        self.name = name
+        self.contractName = contractName
+
+    def __enter__(self):
+        self.timer.stack.append(self.name)
+        self.phasePath = '/'.join(self.timer.stack)
+        # registered on entry so phases are listed in the order they started, parents before children
+        self.timer.phases.setdefault(self.phasePath, [0.0, 0])
+        self.startTime = time()
+
+    def __exit__(self, *args):
+        elapsed = time() - self.startTime
+        self.timer.stack.pop()
+        self.timer.record(self.phasePath, elapsed, self.contractName, self.name)
+
+# Wall clock time of each phase of bringing up the test session. Phases nest, so the time of a phase includes the phases inside it and a phase is reported under the path of the phases it ran in. Phases that work on a single contract are also added up per contract.
+class SessionTimer():
+
+    def __init__(self):
+        self.startTime = time()
+        self.stack = []
+        self.phases = OrderedDict()
+        self.contracts = defaultdict(lambda: defaultdict(float))
+        self.firstTestTime = None
+
+    def phase(self, name, contractName=None):
+        return TimedPhase(self, name, contractName)
+
+    def record(self, phasePath, elapsed, contractName=None, phaseName=None):
+        if phasePath not in self.phases:
+            self.phases[phasePath] = [0.0, 0]
+        self.phases[phasePath][0] += elapsed
+        self.phases[phasePath][1] += 1
+        if contractName:
+            self.contracts[contractName][phaseName or phasePath] += elapsed
+
+    def recordContract(self, contractName, phaseName, elapsed):
+        self.contracts[contractName][phaseName] += elapsed
+
+    def markFirstTest(self):
+        if self.firstTestTime is None:
+            self.firstTestTime = time()
+
+    def getStartupSeconds(self):
+        return (self.firstTestTime or time()) - self.startTime
+
+    def formatPhases(self):
+        lines = ['%10s %8s  %s' % ('seconds', 'count', 'phase')]
+        lines.append('%10.3f %8s  %s' % (self.getStartupSeconds(), '', 'until the first test started'))
+        for phasePath, (seconds, count) in self.phases.items():
+            depth = phasePath.count('/')
+            lines.append('%10.3f %8d  %s%s' % (seconds, count, '  ' * depth, phasePath.split('/')[-1]))
+        return lines
+
+    def formatContracts(self, count):
+        # phases nest (deploy runs inside upload), so the columns overlap and aren't added up
+        phaseNames = sorted(set(phaseName for contractPhases in self.contracts.values() for phaseName in contractPhases))
+        lines = [('%-40s' + ' %14s' * len(phaseNames)) % tuple(['contract'] + phaseNames)]
+        slowest = dict((contractName, max(contractPhases.values())) for contractName, contractPhases in self.contracts.items())
+        for contractName in sorted(slowest, key=slowest.get, reverse=True)[:count]:
+            contractPhases = self.contracts[contractName]
+            lines.append(('%-40s' + ' %14.3f' * len(phaseNames)) % tuple([contractName[:40]] + [contractPhases.get(phaseName, 0.0) for phaseName in phaseNames]))
+        return lines
+
+    def writeReport(self, outputPath):
+        report = {
+            'startupSeconds': self.getStartupSeconds(),
+            'phases': [{ 'phase': phasePath, 'seconds': seconds, 'count': count } for phasePath, (seconds, count) in self.phases.items()],
+            'contracts': dict((contractName, dict(contractPhases)) for contractName, contractPhases in self.contracts.items()),
+        }
+        with open(outputPath, 'w') as file:
+            json_dump(report, file, indent=2, sort_keys=True)
@@ -0,0 +1,142 @@
+#!/usr/bin/env python
+
+from collections import OrderedDict, defaultdict
+from cPickle import dump as pickle_dump, load as pickle_load, HIGHEST_PROTOCOL
+from os import path, remove
+from shutil import rmtree
+from tempfile import mkdtemp
+from weakref import ref
+
+# Rough per object overhead of the strings and dict slots an account entry is made of, used to estimate its size without walking it with sys.getsizeof
+ACCOUNT_OVERHEAD_BYTES = 400
+STORAGE_ENTRY_OVERHEAD_BYTES = 150
+
+def getAccountBytes(account):
+    return ACCOUNT_OVERHEAD_BYTES + len(account.get('code', '')) + sum(len(key) + len(value) + STORAGE_ENTRY_OVERHEAD_BYTES for key, value in account.get('storage', {}).items())
+
+# Stands in for the state of a snapshot in the snapshot dict, so the state itself can be spilled to disk while tests still hold on to the snapshot. The store only keeps the state for as long as something holds on to this.
+class StoredState():
+
+    def __init__(self, stateId):
+        self.stateId = stateId
+
+class InternedAccount():
+
+    def __init__(self, account):
+        self.account = account
+        self.references = 0
+        self.bytes = getAccountBytes(account)
+
+# Keeps the states of the session snapshots within a memory budget. Most accounts are the same in every snapshot built on top of another one (all the contract code for a start), so equal account entries are shared between snapshots and only counted once. When the shared entries still take more than the budget, the least recently used states are written to disk and read back the next time a test resets to them. A state is dropped from memory and disk as soon as its StoredState is garbage collected.
+class SnapshotStore():
+
+    def __init__(self, budgetBytes):
+        self.budgetBytes = budgetBytes
+        self.states = OrderedDict()
+        self.spillPaths = {}
+        # weak references to the StoredState of every live state, which discard the state when it goes away
+        self.handles = {}
+        self.accounts = defaultdict(list)
+        self.residentBytes = 0
+        self.peakBytes = 0
+        self.nextStateId = 0
+        self.spillDirectory = None
+        self.spills = 0
+        self.loads = 0
+        self.discards = 0
+
+    def add(self, state):
+        stateId = self.nextStateId
+        self.nextStateId += 1
+        self.intern(state)
+        self.states[stateId] = state
+        self.evict(stateId)
+        storedState = StoredState(stateId)
+        self.handles[stateId] = ref(storedState, lambda _, stateId=stateId: self.discard(stateId))
+        return storedState
+
+    def get(self, storedState):
+        # snapshots made outside the store are used as they are
+        if not isinstance(storedState, StoredState):
+            return storedState
+        stateId = storedState.stateId
+        if stateId in self.states:
+            # move it to the end, which is the most recently used
+            state = self.states.pop(stateId)
+        else:
+            with open(self.spillPaths[stateId], 'rb') as file:
+                state = pickle_load(file)
+            self.loads += 1
+            self.intern(state)
+        self.states[stateId] = state
+        self.evict(stateId)
+        return state
+
+    def intern(self, state):
+        alloc = state['alloc']
+        for address, account in alloc.items():
+            versions = self.accounts[address]
+            interned = next((version for version in versions if version.account == account), None)
+            if not interned:
+                interned = InternedAccount(account)
+                versions.append(interned)
+                self.residentBytes += interned.bytes
+            interned.references += 1
+            alloc[address] = interned.account
+        self.peakBytes = max(self.peakBytes, self.residentBytes)
+
+    def release(self, state):
+        for address, account in state['alloc'].items():
+            versions = self.accounts[address]
+            interned = next(version for version in versions if version.account is account)
+            interned.references -= 1
+            if not interned.references:
+                versions.remove(interned)
+                self.residentBytes -= interned.bytes
+            if not versions:
+                del self.accounts[address]
+
+    def discard(self, stateId):
+        del self.handles[stateId]
+        if stateId in self.states:
+            self.release(self.states.pop(stateId))
+        spillPath = self.spillPaths.pop(stateId, None)
+        if spillPath and path.exists(spillPath):
+            remove(spillPath)
+        self.discards += 1
+
+    def evict(self, keepStateId):
+        while self.residentBytes > self.budgetBytes:
+            stateId = next((stateId for stateId in self.states if stateId != keepStateId), None)
+            if stateId is None: return
+            self.spill(stateId)
+
+    def spill(self, stateId):
+        state = self.states.pop(stateId)
+        # states never change once they are stored, so a state only has to be written the first time it is spilled
+        if stateId not in self.spillPaths:
+            if not self.spillDirectory:
+                self.spillDirectory = mkdtemp(prefix='augur-snapshots-')
+            spillPath = path.join(self.spillDirectory, '%d.pickle' % stateId)
+            with open(spillPath, 'wb') as file:
+                pickle_dump(state, file, HIGHEST_PROTOCOL)
+            self.spillPaths[stateId] = spillPath
+        self.release(state)
+        self.spills += 1
+
+    def getSharedBytes(self):
+        return sum(interned.bytes for versions in self.accounts.values() for interned in versions if interned.references > 1)
+
+    def formatReport(self):
+        return [
+            '%d snapshot states, %d in memory, %d on disk, %d discarded' % (self.nextStateId, len(self.states), len(set(self.spillPaths) - set(self.states)), self.discards),
+            '%.1f MB in memory (%.1f MB of it shared between snapshots), peak %.1f MB, budget %.1f MB' % (self.residentBytes / 1e6, self.getSharedBytes() / 1e6, self.peakBytes / 1e6, self.budgetBytes / 1e6),
+            '%d states spilled to disk, %d read back' % (self.spills, self.loads),
+        ]
+
+    def close(self):
+        # everything goes with the directory, so nothing needs to be discarded one by one any more
+        self.handles.clear()
+        if self.spillDirectory:
+            rmtree(self.spillDirectory, ignore_errors=True)
+            self.spillDirectory = None
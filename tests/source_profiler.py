@@ -0,0 +1,167 @@
+#!/usr/bin/env python
+
+from bisect import bisect_right
+from collections import defaultdict
+from os import path, makedirs
+from vm_trace import CodeIndex, VmTracer
+
+PUSH1 = 0x60
+PUSH32 = 0x7f
+
+# Decoded solc source map of one piece of bytecode. The source map has one entry per instruction rather than per byte, so program counters are first translated to instruction indexes.
+class SourceMap():
+
+    def __init__(self, bytecode, sourceMap):
+        self.instructionIndexes = {}
+        programCounter = 0
+        instructionIndex = 0
+        while programCounter < len(bytecode):
+            self.instructionIndexes[programCounter] = instructionIndex
+            opcode = bytecode[programCounter]
+            if PUSH1 <= opcode <= PUSH32:
+                programCounter += opcode - PUSH1 + 1
+            programCounter += 1
+            instructionIndex += 1
+        # Entries are s:l:f:j and every empty or missing field repeats the previous entry
+        self.entries = []
+        start, length, fileIndex = 0, 0, -1
+        for entry in sourceMap.split(';'):
+            fields = entry.split(':')
+            if len(fields) > 0 and fields[0]: start = int(fields[0])
+            if len(fields) > 1 and fields[1]: length = int(fields[1])
+            if len(fields) > 2 and fields[2]: fileIndex = int(fields[2])
+            self.entries.append((start, length, fileIndex))
+
+    def getLocation(self, programCounter):
+        instructionIndex = self.instructionIndexes.get(programCounter)
+        if instructionIndex is None or instructionIndex >= len(self.entries):
+            return None
+        start, length, fileIndex = self.entries[instructionIndex]
+        # -1 is code the compiler generated without a source location, like the dispatcher
+        if fileIndex < 0:
+            return None
+        return start, fileIndex
+
+class SourceFile():
+
+    def __init__(self, filePath):
+        with open(filePath, 'r') as file:
+            self.lines = file.read().split('\n')
+        self.lineOffsets = []
+        offset = 0
+        for line in self.lines:
+            self.lineOffsets.append(offset)
+            offset += len(line) + 1
+
+    def getLineNumber(self, offset):
+        return bisect_right(self.lineOffsets, offset)
+
+class ExecutionFrame():
+
+    def __init__(self, contractName, sourceMap, sourceList):
+        self.contractName = contractName
+        self.sourceMap = sourceMap
+        self.sourceList = sourceList
+        self.lastProgramCounter = None
+        self.lastGas = 0
+        self.childGas = 0
+
+# Attributes gas and executed instructions to Solidity source lines for everything the chain runs while it is active. The gas of an instruction is the difference to the next one in the same frame minus whatever the calls it made used. A line is charged for every instruction whose source range starts on it.
+class SourceProfiler(VmTracer):
+
+    def __init__(self, artifacts, repositoryRoot):
+        self.artifacts = artifacts
+        self.repositoryRoot = repositoryRoot
+        self.codeIndex = CodeIndex(artifacts)
+        self.frames = {}
+        self.sourceFiles = {}
+        self.stack = []
+        self.gas = defaultdict(int)
+        self.executions = defaultdict(int)
+        self.unmappedGas = defaultdict(int)
+
+    def getFrame(self, code):
+        if code in self.frames:
+            return self.frames[code]
+        name, isConstructor = self.codeIndex.lookup(code)
+        if not name:
+            self.frames[code] = ExecutionFrame('<unknown>', None, [])
+        else:
+            artifact = self.artifacts[name]
+            sourceMap = artifact['sourceMap'] if isConstructor else artifact['deployedSourceMap']
+            self.frames[code] = ExecutionFrame(name, SourceMap(bytearray(code), sourceMap), artifact['sourceList'])
+        return self.frames[code]
+
+    def applyMsg(self, ext, msg, code):
+        template = self.getFrame(code)
+        frame = ExecutionFrame(template.contractName, template.sourceMap, template.sourceList)
+        self.stack.append(frame)
+        try:
+            result, gasRemaining, data = self.originalApplyMsg(ext, msg, code)
+        finally:
+            self.stack.pop()
+        if frame.lastProgramCounter is not None:
+            self.charge(frame, frame.lastProgramCounter, frame.lastGas - gasRemaining - frame.childGas)
+        if self.stack:
+            self.stack[-1].childGas += msg.gas - gasRemaining
+        return result, gasRemaining, data
+
+    def onOperation(self, operation):
+        if not self.stack: return
+        frame = self.stack[-1]
+        gas = int(operation['gas'])
+        if frame.lastProgramCounter is not None:
+            self.charge(frame, frame.lastProgramCounter, frame.lastGas - gas - frame.childGas)
+        frame.lastProgramCounter = int(operation['pc'])
+        frame.lastGas = gas
+        frame.childGas = 0
+
+    def charge(self, frame, programCounter, gas):
+        location = frame.sourceMap.getLocation(programCounter) if frame.sourceMap else None
+        if location is None:
+            self.unmappedGas[frame.contractName] += gas
+            return
+        start, fileIndex = location
+        sourcePath = frame.sourceList[fileIndex]
+        line = (sourcePath, self.getSourceFile(sourcePath).getLineNumber(start))
+        self.gas[line] += gas
+        self.executions[line] += 1
+
+    def getSourceFile(self, sourcePath):
+        if sourcePath not in self.sourceFiles:
+            self.sourceFiles[sourcePath] = SourceFile(path.join(self.repositoryRoot, sourcePath))
+        return self.sourceFiles[sourcePath]
+
+    def getTotalGas(self):
+        return sum(self.gas.values()) + sum(self.unmappedGas.values())
+
+    def formatHotspots(self, count):
+        totalGas = self.getTotalGas()
+        lines = ['%12s %7s %10s  %s' % ('gas', '%', 'executed', 'line')]
+        if not totalGas: return lines
+        for line in sorted(self.gas, key=self.gas.get, reverse=True)[:count]:
+            sourcePath, lineNumber = line
+            sourceLine = self.getSourceFile(sourcePath).lines[lineNumber - 1].strip()
+            lines.append('%12d %6.2f%% %10d  %s:%d  %s' % (self.gas[line], 100.0 * self.gas[line] / totalGas, self.executions[line], sourcePath, lineNumber, sourceLine[:80]))
+        for contractName in sorted(self.unmappedGas, key=self.unmappedGas.get, reverse=True):
+            lines.append('%12d %6.2f%% %10s  %s (compiler generated)' % (self.unmappedGas[contractName], 100.0 * self.unmappedGas[contractName] / totalGas, '', contractName))
+        return lines
+
+    # Writes a copy of every source file that used gas with the gas and instruction count of each line in front of it
+    def writeAnnotatedSources(self, outputDirectory):
+        fileGas = defaultdict(int)
+        for (sourcePath, lineNumber), gas in self.gas.items():
+            fileGas[sourcePath] += gas
+        for sourcePath in fileGas:
+            outputPath = path.join(outputDirectory, sourcePath + '.txt')
+            if not path.exists(path.dirname(outputPath)):
+                makedirs(path.dirname(outputPath))
+            with open(outputPath, 'w') as file:
+                file.write('%s: %d gas\n' % (sourcePath, fileGas[sourcePath]))
+                for lineNumber, sourceLine in enumerate(self.getSourceFile(sourcePath).lines, 1):
+                    line = (sourcePath, lineNumber)
+                    if line in self.gas:
+                        file.write('%12d %10d | %s\n' % (self.gas[line], self.executions[line], sourceLine))
+                    else:
+                        file.write('%12s %10s | %s\n' % ('', '', sourceLine))
+        return sorted(fileGas, key=fileGas.get, reverse=True)
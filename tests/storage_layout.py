@@ -0,0 +1,193 @@
+#!/usr/bin/env python
+
+from binascii import hexlify
+from re import compile as re_compile
+
+STATIC_ARRAY = re_compile(r'^(.*)\[(\d+)\]$')
+SIZED_INTEGER = re_compile(r'^u?int(\d+)$')
+FIXED_BYTES = re_compile(r'^bytes(\d+)$')
+# A slot of a struct or static array stored under a hashed slot is at most this far past the hash
+MAX_HASHED_OFFSET = 32
+
+def stripDataLocation(typeString):
+    for suffix in [' storage ref', ' storage pointer', ' memory', ' calldata']:
+        if typeString.endswith(suffix):
+            return typeString[:-len(suffix)]
+    return typeString
+
+def getMappingValueType(typeString):
+    # mapping(bytes32 => mapping(address => uint256)) has the value type mapping(address => uint256)
+    return stripDataLocation(typeString)[len('mapping('):-1].split(' => ', 1)[1]
+
+def getElementarySize(typeString):
+    if typeString == 'bool' or typeString == 'byte' or typeString.startswith('enum '):
+        return 1
+    if typeString == 'address' or typeString.startswith('contract '):
+        return 20
+    match = SIZED_INTEGER.match(typeString)
+    if match:
+        return int(match.group(1)) // 8
+    match = FIXED_BYTES.match(typeString)
+    if match:
+        return int(match.group(1))
+    return 32
+
+# Returns how many bytes a value of the type takes when it can share a slot, or None when it always starts a new slot, and how many slots it takes
+def getStorageSize(typeString, structs):
+    typeString = stripDataLocation(typeString)
+    if typeString.startswith('mapping(') or typeString.endswith('[]') or typeString in ['string', 'bytes']:
+        return None, 1
+    if typeString.startswith('struct '):
+        return None, structs[typeString[len('struct '):]]['slots']
+    match = STATIC_ARRAY.match(typeString)
+    if match:
+        elementSize, elementSlots = getStorageSize(match.group(1), structs)
+        length = int(match.group(2))
+        if elementSize is None:
+            return None, elementSlots * length
+        elementsPerSlot = 32 // elementSize
+        return None, (length + elementsPerSlot - 1) // elementsPerSlot
+    return getElementarySize(typeString), 1
+
+# Lays out variables the way solc does: in order, packing values smaller than a slot together, while structs, arrays and mappings always start a new slot and so does whatever follows them
+def assignSlots(declarations, structs):
+    entries = []
+    slot = 0
+    offset = 0
+    for label, typeString in declarations:
+        size, slots = getStorageSize(typeString, structs)
+        if size is None:
+            if offset:
+                slot += 1
+                offset = 0
+            entries.append([slot, 0, label, typeString, slots])
+            slot += slots
+        else:
+            if offset + size > 32:
+                slot += 1
+                offset = 0
+            entries.append([slot, offset, label, typeString, 1])
+            offset += size
+    return entries, slot + (1 if offset else 0)
+
+def walkAst(node):
+    if isinstance(node, dict):
+        yield node
+        for value in node.values():
+            for child in walkAst(value):
+                yield child
+    elif isinstance(node, list):
+        for item in node:
+            for child in walkAst(item):
+                yield child
+
+# solc 0.4 doesn't report storage layouts, so this rebuilds the layout of a contract from the compact ASTs of every source it was compiled from
+def createStorageLayout(sourceAsts, contractName):
+    contracts = {}
+    structDefinitions = {}
+    for ast in sourceAsts:
+        for node in walkAst(ast):
+            if node.get('nodeType') == 'ContractDefinition':
+                contracts[node['id']] = node
+            elif node.get('nodeType') == 'StructDefinition':
+                structDefinitions[node['canonicalName']] = node
+    structs = {}
+    def layoutStruct(name):
+        if name in structs: return
+        members = [(member['name'], member['typeDescriptions']['typeString']) for member in structDefinitions[name]['members']]
+        for _, typeString in members:
+            # nested structs have to be laid out before the struct that contains them
+            for nestedName in findStructNames(typeString):
+                layoutStruct(nestedName)
+        entries, slots = assignSlots(members, structs)
+        structs[name] = { 'slots': slots, 'members': entries }
+    for name in structDefinitions:
+        layoutStruct(name)
+    contract = [node for node in contracts.values() if node['name'] == contractName and node.get('contractKind') == 'contract']
+    if not contract:
+        return None
+    declarations = []
+    # linearizedBaseContracts goes from the most derived contract to the most basic one and storage starts with the most basic one
+    for contractId in reversed(contract[0]['linearizedBaseContracts']):
+        for node in contracts[contractId]['nodes']:
+            if node.get('nodeType') == 'VariableDeclaration' and node.get('stateVariable') and not node.get('constant'):
+                declarations.append((node['name'], node['typeDescriptions']['typeString']))
+    entries, slots = assignSlots(declarations, structs)
+    return { 'variables': entries, 'slots': slots, 'structs': structs }
+
+def findStructNames(typeString):
+    names = []
+    position = typeString.find('struct ')
+    while position >= 0:
+        name = typeString[position + len('struct '):].split(' ')[0].split('[')[0].rstrip(')')
+        names.append(name)
+        position = typeString.find('struct ', position + 1)
+    return names
+
+def formatKey(key):
+    value = int(hexlify(key), 16)
+    if value < 2**64:
+        return str(value)
+    if key[:12] == '\x00' * 12:
+        return '0x' + hexlify(key[12:])
+    return '0x' + hexlify(key[:4]) + '..'
+
+# Names storage slots of one contract. Slots of mappings and dynamic arrays are hashes, so those are decoded with the preimages of every 32 and 64 byte hash computed while the profiler was running.
+class StorageDecoder():
+
+    def __init__(self, storageLayout, preimages):
+        self.variables = storageLayout['variables']
+        self.slotCount = storageLayout['slots']
+        self.structs = storageLayout['structs']
+        self.preimages = preimages
+        self.labels = {}
+
+    def getLabel(self, slot):
+        if slot not in self.labels:
+            decoded = self.decode(slot, 0)
+            self.labels[slot] = decoded[0] if decoded else None
+        return self.labels[slot]
+
+    def decode(self, slot, depth):
+        if slot < self.slotCount:
+            return self.decodeWithin(self.variables, slot)
+        if depth > 8: return None
+        for delta in range(MAX_HASHED_OFFSET):
+            preimage = self.preimages.get(slot - delta)
+            if preimage is None: continue
+            key, baseSlot = preimage
+            base = self.decode(baseSlot, depth + 1)
+            if base is None: return None
+            baseLabel, baseType = base
+            baseType = stripDataLocation(baseType)
+            if key is None and baseType.endswith('[]'):
+                elementType = baseType[:-2]
+                size, slots = getStorageSize(elementType, self.structs)
+                if size is None:
+                    return self.decodeWithinType('%s[%d]' % (baseLabel, delta // slots), elementType, delta % slots)
+                return ('%s[%d]' % (baseLabel, delta * (32 // size)), elementType)
+            if key is not None and baseType.startswith('mapping('):
+                return self.decodeWithinType('%s[%s]' % (baseLabel, formatKey(key)), getMappingValueType(baseType), delta)
+            return None
+        return None
+
+    def decodeWithin(self, entries, slot):
+        labels = [(label, typeString, slot - entrySlot) for entrySlot, offset, label, typeString, slots in entries if entrySlot <= slot < entrySlot + slots]
+        if not labels:
+            return None
+        if len(labels) > 1:
+            # several small values packed into the slot
+            return ('|'.join(label for label, _, _ in labels), labels[0][1])
+        label, typeString, delta = labels[0]
+        return self.decodeWithinType(label, typeString, delta)
+
+    def decodeWithinType(self, label, typeString, delta):
+        typeString = stripDataLocation(typeString)
+        if typeString.startswith('struct '):
+            members = self.decodeWithin(self.structs[typeString[len('struct '):]]['members'], delta)
+            if members is None: return None
+            return ('%s.%s' % (label, members[0]), members[1])
+        match = STATIC_ARRAY.match(typeString)
+        if match and delta:
+            return ('%s[+%d]' % (label, delta), match.group(1))
+        return (label, typeString)
@@ -0,0 +1,197 @@
+#!/usr/bin/env python
+
+from binascii import hexlify
+from collections import defaultdict
+from json import dump as json_dump
+from re import sub
+from ethereum import utils
+from storage_layout import StorageDecoder
+from vm_trace import CodeIndex, VmTracer
+
+# Byzantium storage costs
+SLOAD_GAS = 200
+SSTORE_SET_GAS = 20000
+SSTORE_RESET_GAS = 5000
+SSTORE_CLEAR_REFUND = 15000
+
+class StorageCounters():
+
+    FIELDS = ['sloads', 'firstSloads', 'sets', 'updates', 'rewrites', 'clears', 'firstSstores', 'gas', 'refunds']
+
+    def __init__(self):
+        for field in StorageCounters.FIELDS:
+            setattr(self, field, 0)
+
+    def add(self, other):
+        for field in StorageCounters.FIELDS:
+            setattr(self, field, getattr(self, field) + getattr(other, field))
+
+    def toDict(self):
+        return dict((field, getattr(self, field)) for field in StorageCounters.FIELDS)
+
+class StorageFrame():
+
+    def __init__(self, ext, address, contractName):
+        self.ext = ext
+        self.address = address
+        self.contractName = contractName
+
+# Counts every SLOAD and SSTORE while it is active, per contract, per storage slot and per kind of transaction. The EVM these tests run on has no notion of cold and warm slots yet, so the first access to a slot within a transaction is counted separately from repeated ones. That is what would be cold under EIP-2929 and what packing or caching a value in memory would save. SSTOREs are split into zero to nonzero (set), nonzero to another value (update), writing the current value again (rewrite) and nonzero to zero (clear, which earns a refund).
+class StorageProfiler(VmTracer):
+
+    def __init__(self, artifacts, functionSelectors):
+        self.artifacts = artifacts
+        self.functionSelectors = functionSelectors
+        self.codeIndex = CodeIndex(artifacts)
+        self.stack = []
+        self.touchedSlots = set()
+        self.transactionLabel = None
+        self.transactionCounters = StorageCounters()
+        self.contracts = defaultdict(StorageCounters)
+        self.slots = defaultdict(StorageCounters)
+        self.transactions = defaultdict(StorageCounters)
+        self.transactionCounts = defaultdict(int)
+        self.preimages = {}
+        self.decoders = {}
+
+    def start(self):
+        VmTracer.start(self)
+        self.originalSha3 = utils.sha3
+        utils.sha3 = self.sha3
+
+    def stop(self):
+        utils.sha3 = self.originalSha3
+        VmTracer.stop(self)
+
+    # Mapping slots are sha3(key . slot) and dynamic array data starts at sha3(slot). Remembering those preimages is what lets us name hashed slots later.
+    def sha3(self, data):
+        result = self.originalSha3(data)
+        if len(data) == 64:
+            self.preimages[utils.big_endian_to_int(result)] = (data[:32], utils.big_endian_to_int(data[32:]))
+        elif len(data) == 32:
+            self.preimages.setdefault(utils.big_endian_to_int(result), (None, utils.big_endian_to_int(data)))
+        return result
+
+    def applyMsg(self, ext, msg, code):
+        contractName = self.codeIndex.lookup(code)[0] or '0x' + hexlify(msg.code_address)
+        if not self.stack:
+            self.transactionLabel = self.getTransactionLabel(contractName, msg)
+        # storage always belongs to msg.to, even when the code is delegated to
+        self.stack.append(StorageFrame(ext, msg.to, contractName))
+        try:
+            return self.originalApplyMsg(ext, msg, code)
+        finally:
+            self.stack.pop()
+            if not self.stack:
+                self.endTransaction()
+
+    def getTransactionLabel(self, contractName, msg):
+        if msg.is_create:
+            return contractName + '.constructor'
+        callData = msg.data.extract_all()
+        if len(callData) < 4:
+            return contractName + '.fallback'
+        selector = int(hexlify(callData[:4]), 16)
+        return contractName + '.' + self.functionSelectors.get(selector, '0x%08x' % selector)
+
+    def endTransaction(self):
+        self.transactions[self.transactionLabel].add(self.transactionCounters)
+        self.transactionCounts[self.transactionLabel] += 1
+        self.transactionCounters = StorageCounters()
+        self.touchedSlots = set()
+
+    def onOperation(self, operation):
+        if operation['op'] not in ['SLOAD', 'SSTORE'] or not self.stack: return
+        frame = self.stack[-1]
+        stack = operation['stack']
+        slot = int(stack[-1])
+        # VmTracer only passes on the record made before the instruction runs, so storage still holds the old value
+        counters = StorageCounters()
+        first = (frame.address, slot) not in self.touchedSlots
+        self.touchedSlots.add((frame.address, slot))
+        if operation['op'] == 'SLOAD':
+            counters.sloads = 1
+            counters.firstSloads = 1 if first else 0
+            counters.gas = SLOAD_GAS
+        else:
+            value = int(stack[-2])
+            currentValue = frame.ext.get_storage_data(frame.address, slot)
+            counters.firstSstores = 1 if first else 0
+            if not currentValue and value:
+                counters.sets = 1
+                counters.gas = SSTORE_SET_GAS
+            elif currentValue and not value:
+                counters.clears = 1
+                counters.gas = SSTORE_RESET_GAS
+                counters.refunds = SSTORE_CLEAR_REFUND
+            elif currentValue == value:
+                counters.rewrites = 1
+                counters.gas = SSTORE_RESET_GAS
+            else:
+                counters.updates = 1
+                counters.gas = SSTORE_RESET_GAS
+        self.contracts[frame.contractName].add(counters)
+        self.slots[(frame.contractName, slot)].add(counters)
+        self.transactionCounters.add(counters)
+
+    def getSlotLabel(self, contractName, slot):
+        if contractName not in self.decoders:
+            storageLayout = self.artifacts.get(contractName, {}).get('storageLayout')
+            self.decoders[contractName] = StorageDecoder(storageLayout, self.preimages) if storageLayout else None
+        decoder = self.decoders[contractName]
+        label = decoder.getLabel(slot) if decoder else None
+        if label: return label
+        return 'slot %d' % slot if slot < 2**64 else 'slot 0x%064x' % slot
+
+    def getVariables(self):
+        # slots of the same variable under different mapping keys or array indexes are added up
+        variables = defaultdict(StorageCounters)
+        for (contractName, slot), counters in self.slots.items():
+            label = self.getSlotLabel(contractName, slot)
+            if not label.startswith('slot '):
+                label = sub(r'\[[^\]]*\]', '[]', label)
+            variables[(contractName, label)].add(counters)
+        return variables
+
+    def formatCountersHeader(self, name):
+        return '%-64s %8s %8s %8s %8s %8s %8s %8s %10s %10s' % (name, 'sload', '1st', 'set', 'update', 'rewrite', 'clear', '1st', 'gas', 'refunds')
+
+    def formatCounters(self, name, counters):
+        return '%-64s %8d %8d %8d %8d %8d %8d %8d %10d %10d' % (name[:64], counters.sloads, counters.firstSloads, counters.sets, counters.updates, counters.rewrites, counters.clears, counters.firstSstores, counters.gas, counters.refunds)
+
+    def formatReport(self, count):
+        lines = [self.formatCountersHeader('contract')]
+        for contractName in sorted(self.contracts, key=lambda name: self.contracts[name].gas, reverse=True):
+            lines.append(self.formatCounters(contractName, self.contracts[contractName]))
+        lines.append('')
+        variables = self.getVariables()
+        lines.append(self.formatCountersHeader('variable'))
+        for variable in sorted(variables, key=lambda variable: variables[variable].gas, reverse=True)[:count]:
+            lines.append(self.formatCounters('%s.%s' % variable, variables[variable]))
+        lines.append('')
+        lines.append(self.formatCountersHeader('transaction (average)'))
+        for label in sorted(self.transactions, key=lambda label: self.transactions[label].gas / self.transactionCounts[label], reverse=True)[:count]:
+            average = StorageCounters()
+            for field in StorageCounters.FIELDS:
+                setattr(average, field, getattr(self.transactions[label], field) // self.transactionCounts[label])
+            lines.append(self.formatCounters('%s x%d' % (label, self.transactionCounts[label]), average))
+        return lines
+
+    def writeReport(self, outputPath):
+        slots = []
+        for (contractName, slot), counters in sorted(self.slots.items(), key=lambda item: item[1].gas, reverse=True):
+            entry = counters.toDict()
+            entry.update({ 'contract': contractName, 'slot': '0x%x' % slot, 'label': self.getSlotLabel(contractName, slot) })
+            slots.append(entry)
+        transactions = []
+        for label, counters in self.transactions.items():
+            entry = counters.toDict()
+            entry.update({ 'transaction': label, 'count': self.transactionCounts[label] })
+            transactions.append(entry)
+        report = {
+            'contracts': dict((contractName, counters.toDict()) for contractName, counters in self.contracts.items()),
+            'slots': slots,
+            'transactions': transactions,
+        }
+        with open(outputPath, 'w') as file:
+            json_dump(report, file, indent=2, sort_keys=True)
@@ -0,0 +1,29 @@
+from ethereum.tools.tester import ABIContract
+from pytest import fixture, mark
+import pytest
+from load_generator import LoadGenerator, LoadProfile
+
+pytestmark = mark.skipif('not config.option.loadTest', reason="The load test only runs with --loadTest")
+
+def test_tradingAndReportingLoad(localFixture, universe, cash):
+    generator = LoadGenerator(localFixture, universe, cash, LoadProfile.fromOptions(pytest.config.option))
+    generator.run()
+    pytest.config.loadGenerators.append(generator)
+    if pytest.config.option.loadReportFile:
+        generator.writeReport(pytest.config.option.loadReportFile)
+    # every stage has to have got something done, or the numbers say nothing about throughput
+    for stage in generator.stages:
+        assert stage.transactions
+
+@fixture
+def localFixture(fixture, kitchenSinkSnapshot):
+    fixture.resetToSnapshot(kitchenSinkSnapshot)
+    return fixture
+
+@fixture
+def universe(localFixture, kitchenSinkSnapshot):
+    return ABIContract(localFixture.chain, kitchenSinkSnapshot['universe'].translator, kitchenSinkSnapshot['universe'].address)
+
+@fixture
+def cash(localFixture, kitchenSinkSnapshot):
+    return ABIContract(localFixture.chain, kitchenSinkSnapshot['cash'].translator, kitchenSinkSnapshot['cash'].address)
@@ -0,0 +1,105 @@
+#!/usr/bin/env python
+
+from contextlib import contextmanager
+from ethereum.tools import tester
+from os import path
+from pytest import skip
+from gas_profiler import GasProfiler
+from source_profiler import SourceProfiler
+from storage_profiler import StorageProfiler
+
+REPOSITORY_ROOT = path.abspath(path.join(path.dirname(__file__), '..'))
+# PUSH1 2a PUSH1 0 SSTORE PUSH1 0 SLOAD STOP
+STORE_AND_LOAD = '602a60005560005400'
+STORE_AND_LOAD_SOURCE = 'a = 42;\nb = a;\n'
+# the first three instructions come from line 1, the next two from line 2 and STOP from no line at all
+STORE_AND_LOAD_SOURCE_MAP = '0:7:0;;;8:6:0;;0:0:-1'
+
+# Deploys runtime code as is, with init code that only copies it to memory and returns it
+def deployRuntime(chain, runtime):
+    length = len(runtime) // 2
+    return chain.contract(('60%02x600c60003960%02x6000f3' % (length, length) + runtime).decode('hex'), language='evm')
+
+def test_sourceProfiler(tmpdir):
+    tmpdir.join('store.sol').write(STORE_AND_LOAD_SOURCE)
+    artifacts = { 'StoreAndLoad': { 'bytecode': '00', 'deployedBytecode': STORE_AND_LOAD, 'sourceMap': '', 'deployedSourceMap': STORE_AND_LOAD_SOURCE_MAP, 'sourceList': ['store.sol'] } }
+    chain = tester.Chain()
+    address = deployRuntime(chain, STORE_AND_LOAD)
+    profiler = SourceProfiler(artifacts, str(tmpdir))
+    profiler.start()
+    try:
+        chain.tx(to=address)
+    finally:
+        profiler.stop()
+    assert dict(profiler.gas) == { ('store.sol', 1): 3 + 3 + 20000, ('store.sol', 2): 3 + 200 }
+    assert dict(profiler.executions) == { ('store.sol', 1): 3, ('store.sol', 2): 2 }
+    assert dict(profiler.unmappedGas) == { 'StoreAndLoad': 0 }
+
+# A warm cache loads the kitchen sink from disk, so none of its contracts is uploaded in this process and their artifacts have to come from the snapshot
+@contextmanager
+def loadedPersistedSnapshot(fixture):
+    uploadedArtifacts = dict(fixture.artifacts)
+    functionSelectors = dict(fixture.functionSelectors)
+    loadAllSnapshotArtifacts = fixture.loadAllSnapshotArtifacts
+    fixture.artifacts.clear()
+    fixture.functionSelectors.clear()
+    fixture.loadAllSnapshotArtifacts = True
+    try:
+        snapshot = fixture.loadPersistedSnapshot('kitchenSink')
+        if not snapshot:
+            skip("the kitchen sink snapshot isn't persisted in coverage runs")
+        yield snapshot
+    finally:
+        fixture.artifacts.update(uploadedArtifacts)
+        fixture.functionSelectors.update(functionSelectors)
+        fixture.loadAllSnapshotArtifacts = loadAllSnapshotArtifacts
+
+def profileVmTracer(profiler, transaction):
+    profiler.start()
+    try:
+        transaction()
+    finally:
+        profiler.stop()
+    return profiler
+
+def test_sourceProfilerOnPersistedSnapshot(fixture, kitchenSinkSnapshot):
+    with loadedPersistedSnapshot(fixture) as snapshot:
+        profiler = profileVmTracer(SourceProfiler(fixture.artifacts, REPOSITORY_ROOT), snapshot['universe'].getOrCacheReportingFeeDivisor)
+    assert '<unknown>' not in profiler.unmappedGas
+    assert any(sourcePath.endswith('reporting/Universe.sol') for sourcePath, _ in profiler.gas)
+
+def test_storageProfiler():
+    chain = tester.Chain()
+    address = deployRuntime(chain, STORE_AND_LOAD)
+    profiler = StorageProfiler({}, {})
+    profiler.start()
+    try:
+        chain.tx(to=address)
+    finally:
+        profiler.stop()
+    counters = profiler.contracts['0x' + address.encode('hex')].toDict()
+    assert counters['sets'] == 1
+    assert counters['firstSstores'] == 1
+    assert counters['rewrites'] == 0
+    assert counters['sloads'] == 1
+    assert counters['firstSloads'] == 0
+    assert counters['gas'] == 20000 + 200
+
+def test_storageProfilerOnPersistedSnapshot(fixture, kitchenSinkSnapshot):
+    with loadedPersistedSnapshot(fixture) as snapshot:
+        profiler = profileVmTracer(StorageProfiler(fixture.artifacts, fixture.functionSelectors), snapshot['universe'].getOrCacheReportingFeeDivisor)
+    assert not [contractName for contractName in profiler.contracts if contractName.startswith('0x')]
+    assert [label for label in profiler.transactions if label.endswith('.getOrCacheReportingFeeDivisor')]
+    # slots are named after the state variables in the storage layout of the artifact
+    assert [label for label in profiler.getVariables() if not label[1].startswith('slot ')]
+
+def getLabels(node):
+    return [node.label] + [label for child in node.children.values() for label in getLabels(child)]
+
+def test_gasProfilerOnPersistedSnapshot(fixture, kitchenSinkSnapshot):
+    with loadedPersistedSnapshot(fixture) as snapshot:
+        with GasProfiler(fixture, 'getOrCacheReportingFeeDivisor') as profiler:
+            snapshot['universe'].getOrCacheReportingFeeDivisor()
+    labels = getLabels(profiler.root)[1:]
+    assert labels
+    assert not [label for label in labels if label.startswith('0x') or '.0x' in label]
@@ -1,95 +1,13 @@
 from ethereum.tools import tester
 from ethereum.tools.tester import ABIContract, TransactionFailed
 from pytest import fixture, mark, raises
-from utils import longTo32Bytes, PrintGasUsed, fix
-from constants import BID, ASK, YES, NO
+from utils import longTo32Bytes, GasBenchmark, fix
+from constants import BID, ASK, YES, NO, LONG
 from datetime import timedelta
 from trading.test_claimTradingProceeds import acquireLongShares, finalizeMarket
 from reporting_utils import proceedToNextRound, proceedToFork, finalizeFork, proceedToDesignatedReporting
 
-pytestmark = mark.skip(reason="Just for testing gas cost")
-
-# Trading Max Costs
-
-CREATE_ORDER_BEST_CASE    =   [
-    547694,
-    562138,
-    576582,
-    591026,
-    605470,
-    619914,
-    634358,
-]
-
-CREATE_ORDER_MAXES    =   [
-    695034,
-    794664,
-    894294,
-    993924,
-    1093554,
-    1193184,
-    1292814,
-]
-
-CANCEL_ORDER_MAXES    =   [
-    289826,
-    379095,
-    468364,
-    557633,
-    646902,
-    736171,
-    825440,
-]
-
-FILL_ORDER_TAKE_SHARES   =   [
-    464780,
-    479514,
-    494248,
-    508981,
-    523715,
-    538449,
-    553183,
-]
-
-FILL_ORDER_BOTH_ETH    =   [
-    839050,
-    1029970,
-    1220890,
-    1411809,
-    1602729,
-    1793649,
-    1984569,
-]
-
-FILL_ORDER_MAKER_REVERSE_POSITION    =   [
-    933495,
-    1172245,
-    1410995,
-    1649744,
-    1888494,
-    2127244,
-    2365994,
-]
-
-FILL_ORDER_TAKER_REVERSE_POSITION    =   [
-    939239,
-    1115159,
-    1291079,
-    1466998,
-    1642918,
-    1818838,
-    1994758,
-]
-
-FILL_ORDER_DOUBLE_REVERSE_POSITION    =   [
-    2134777,
-    2455117,
-    2775457,
-    3095796,
-    3416136,
-    3736476,
-    4056816,
-]
+pytestmark = mark.skipif('not config.option.gasBench', reason="Gas benchmarks only run with --gasBench")
 
 tester.STARTGAS = long(6.7 * 10**6)
 
@@ -100,16 +18,12 @@ def test_order_creation_best_case(numOutcomes, localFixture, markets):
     marketIndex = numOutcomes - 2
     market = markets[marketIndex]
 
-    maxGas = 0
     cost = fix('1', '5000')
 
     outcome = 0
 
-    startGas = localFixture.chain.head_state.gas_used
-    orderID = createOrder.publicCreateOrder(BID, fix(1), 5000, market.address, outcome, longTo32Bytes(0), longTo32Bytes(0), "7", value = fix(1, 5000))
-    maxGas = localFixture.chain.head_state.gas_used - startGas
-
-    assert maxGas == CREATE_ORDER_BEST_CASE[marketIndex]
+    with GasBenchmark(localFixture, "CREATE_ORDER_BEST_CASE_%d_OUTCOMES" % numOutcomes):
+        orderID = createOrder.publicCreateOrder(BID, fix(1), 5000, market.address, outcome, longTo32Bytes(0), longTo32Bytes(0), "7", value = fix(1, 5000))
 
 @mark.parametrize('numOutcomes', range(2,9))
 def test_orderCreationMax(numOutcomes, localFixture, markets):
@@ -118,7 +32,6 @@ def test_orderCreationMax(numOutcomes, localFixture, markets):
     marketIndex = numOutcomes - 2
     market = markets[marketIndex]
 
-    maxGas = 0
     cost = fix('1', '5000')
 
     assert completeSets.publicBuyCompleteSets(market.address, 100, value=1000000)
@@ -126,11 +39,8 @@ def test_orderCreationMax(numOutcomes, localFixture, markets):
     shareToken = localFixture.applySignature('ShareToken', market.getShareToken(outcome))
     shareToken.transfer(tester.a7, 100)
 
-    startGas = localFixture.chain.head_state.gas_used
-    orderID = createOrder.publicCreateOrder(BID, fix(1), 5000, market.address, outcome, longTo32Bytes(0), longTo32Bytes(0), "7", value = fix(1, 5000))
-    maxGas = localFixture.chain.head_state.gas_used - startGas
-
-    assert maxGas == CREATE_ORDER_MAXES[marketIndex]
+    with GasBenchmark(localFixture, "CREATE_ORDER_MAXES_%d_OUTCOMES" % numOutcomes):
+        orderID = createOrder.publicCreateOrder(BID, fix(1), 5000, market.address, outcome, longTo32Bytes(0), longTo32Bytes(0), "7", value = fix(1, 5000))
 
 @mark.parametrize('numOutcomes', range(2,9))
 def test_orderCancelationMax(numOutcomes, localFixture, markets):
@@ -147,11 +57,8 @@ def test_orderCancelationMax(numOutcomes, localFixture, markets):
 
     orderID = createOrder.publicCreateOrder(BID, fix(1), 5000, market.address, outcome, longTo32Bytes(0), longTo32Bytes(0), "7", value = fix(1, 5000))
 
-    startGas = localFixture.chain.head_state.gas_used
-    cancelOrder.cancelOrder(orderID)
-    maxGas = localFixture.chain.head_state.gas_used - startGas
-
-    assert maxGas == CANCEL_ORDER_MAXES[marketIndex]
+    with GasBenchmark(localFixture, "CANCEL_ORDER_MAXES_%d_OUTCOMES" % numOutcomes):
+        cancelOrder.cancelOrder(orderID)
 
 @mark.parametrize('numOutcomes', range(2,9))
 def test_order_filling_take_shares(numOutcomes, localFixture, markets):
@@ -168,11 +75,8 @@ def test_order_filling_take_shares(numOutcomes, localFixture, markets):
     outcome = 0
     orderID = createOrder.publicCreateOrder(ASK, 100, 5000, market.address, outcome, longTo32Bytes(0), longTo32Bytes(0), "7", value = cost)
 
-    startGas = localFixture.chain.head_state.gas_used
-    fillOrder.publicFillOrder(orderID, fix(1), tradeGroupID, sender = tester.k1, value=cost)
-    maxGas = localFixture.chain.head_state.gas_used - startGas
-
-    assert maxGas == FILL_ORDER_TAKE_SHARES[marketIndex]
+    with GasBenchmark(localFixture, "FILL_ORDER_TAKE_SHARES_%d_OUTCOMES" % numOutcomes):
+        fillOrder.publicFillOrder(orderID, fix(1), tradeGroupID, sender = tester.k1, value=cost)
 
 @mark.parametrize('numOutcomes', range(2,9))
 def test_order_filling_both_eth(numOutcomes, localFixture, markets):
@@ -188,11 +92,8 @@ def test_order_filling_both_eth(numOutcomes, localFixture, markets):
     outcome = 0
     orderID = createOrder.publicCreateOrder(BID, fix(1), 5000, market.address, outcome, longTo32Bytes(0), longTo32Bytes(0), "7", value = fix(1, 5000))
 
-    startGas = localFixture.chain.head_state.gas_used
-    fillOrder.publicFillOrder(orderID, fix(1), tradeGroupID, sender = tester.k1, value=cost)
-    maxGas = localFixture.chain.head_state.gas_used - startGas
-
-    assert maxGas == FILL_ORDER_BOTH_ETH[marketIndex]
+    with GasBenchmark(localFixture, "FILL_ORDER_BOTH_ETH_%d_OUTCOMES" % numOutcomes):
+        fillOrder.publicFillOrder(orderID, fix(1), tradeGroupID, sender = tester.k1, value=cost)
 
 @mark.parametrize('numOutcomes', range(2,9))
 def test_order_filling_maker_reverse(numOutcomes, localFixture, markets):
@@ -211,11 +112,8 @@ def test_order_filling_maker_reverse(numOutcomes, localFixture, markets):
     shareToken.transfer(tester.a2, 100)
     orderID = createOrder.publicCreateOrder(BID, fix(1), 5000, market.address, outcome, longTo32Bytes(0), longTo32Bytes(0), "7", value = fix(1, 5000))
 
-    startGas = localFixture.chain.head_state.gas_used
-    fillOrder.publicFillOrder(orderID, fix(1), tradeGroupID, sender = tester.k1, value=cost)
-    maxGas = localFixture.chain.head_state.gas_used - startGas
-
-    assert maxGas == FILL_ORDER_MAKER_REVERSE_POSITION[marketIndex]
+    with GasBenchmark(localFixture, "FILL_ORDER_MAKER_REVERSE_POSITION_%d_OUTCOMES" % numOutcomes):
+        fillOrder.publicFillOrder(orderID, fix(1), tradeGroupID, sender = tester.k1, value=cost)
 
 @mark.parametrize('numOutcomes', range(2,9))
 def test_order_filling_taker_reverse(numOutcomes, localFixture, markets):
@@ -234,11 +132,8 @@ def test_order_filling_taker_reverse(numOutcomes, localFixture, markets):
     shareToken.transfer(tester.a1, 100, sender = tester.k2)
     orderID = createOrder.publicCreateOrder(BID, fix(1), 5000, market.address, outcome, longTo32Bytes(0), longTo32Bytes(0), "7", value = fix(1, 5000))
 
-    startGas = localFixture.chain.head_state.gas_used
-    fillOrder.publicFillOrder(orderID, fix(1), tradeGroupID, sender = tester.k1, value=cost)
-    maxGas = localFixture.chain.head_state.gas_used - startGas
-
-    assert maxGas == FILL_ORDER_TAKER_REVERSE_POSITION[marketIndex]
+    with GasBenchmark(localFixture, "FILL_ORDER_TAKER_REVERSE_POSITION_%d_OUTCOMES" % numOutcomes):
+        fillOrder.publicFillOrder(orderID, fix(1), tradeGroupID, sender = tester.k1, value=cost)
 
 @mark.parametrize('numOutcomes', range(2,9))
 def test_order_filling_double_reverse(numOutcomes, localFixture, markets):
@@ -257,11 +152,23 @@ def test_order_filling_double_reverse(numOutcomes, localFixture, markets):
     shareToken.transfer(tester.a1, 100)
     orderID = createOrder.publicCreateOrder(BID, fix(1), 5000, market.address, outcome, longTo32Bytes(0), longTo32Bytes(0), "7", value = fix(1, 5000))
 
-    startGas = localFixture.chain.head_state.gas_used
-    fillOrder.publicFillOrder(orderID, fix(1), tradeGroupID, sender = tester.k1, value=cost)
-    maxGas = localFixture.chain.head_state.gas_used - startGas
+    with GasBenchmark(localFixture, "FILL_ORDER_DOUBLE_REVERSE_POSITION_%d_OUTCOMES" % numOutcomes):
+        fillOrder.publicFillOrder(orderID, fix(1), tradeGroupID, sender = tester.k1, value=cost)
+
+@mark.parametrize('numOrders', range(1,6))
+def test_trade_across_orders(numOrders, localFixture, markets):
+    createOrder = localFixture.contracts['CreateOrder']
+    trade = localFixture.contracts['Trade']
+    tradeGroupID = "42"
+    market = markets[0]
+
+    outcome = 0
+    for i in range(numOrders):
+        createOrder.publicCreateOrder(ASK, fix(1), 5000 + i, market.address, outcome, longTo32Bytes(0), longTo32Bytes(0), "7", sender = tester.k1, value = fix(1, 5000 - i))
 
-    assert maxGas == FILL_ORDER_DOUBLE_REVERSE_POSITION[marketIndex]
+    price = 5000 + numOrders
+    with GasBenchmark(localFixture, "TRADE_ACROSS_%d_ORDERS" % numOrders):
+        trade.publicTrade(LONG, market.address, outcome, fix(numOrders), price, longTo32Bytes(0), longTo32Bytes(0), tradeGroupID, sender = tester.k2, value = fix(numOrders, price))
 
 
 @fixture(scope="session")
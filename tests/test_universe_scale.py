@@ -0,0 +1,28 @@
+from ethereum.tools.tester import ABIContract
+from pytest import fixture, mark
+import pytest
+from universe_benchmark import UniverseBenchmark
+
+pytestmark = mark.skipif('not config.option.universeBench', reason="The universe scale benchmark only runs with --universeBench")
+
+def test_universeScale(localFixture, universe, cash):
+    option = pytest.config.option
+    benchmark = UniverseBenchmark(localFixture, universe, cash, option.universeBenchWindows, option.universeBenchMarkets)
+    benchmark.run()
+    pytest.config.universeBenchmarks.append(benchmark)
+    if option.universeBenchFile:
+        benchmark.writeCsv(option.universeBenchFile)
+    assert benchmark.markets == option.universeBenchWindows * option.universeBenchMarkets
+
+@fixture
+def localFixture(fixture, kitchenSinkSnapshot):
+    fixture.resetToSnapshot(kitchenSinkSnapshot)
+    return fixture
+
+@fixture
+def universe(localFixture, kitchenSinkSnapshot):
+    return ABIContract(localFixture.chain, kitchenSinkSnapshot['universe'].translator, kitchenSinkSnapshot['universe'].address)
+
+@fixture
+def cash(localFixture, kitchenSinkSnapshot):
+    return ABIContract(localFixture.chain, kitchenSinkSnapshot['cash'].translator, kitchenSinkSnapshot['cash'].address)
@@ -0,0 +1,279 @@
+#!/usr/bin/env python
+
+from constants import BID, ASK
+
+# Integer exact model of CreateOrder's escrow and FillOrder's Trade library, so random fills can be checked by the thousand in Python and only the interesting ones have to be replayed on chain. Every participant is modelled as holding some shares of the order's outcome (long) and the same number of shares of every other outcome (a short set), which is all the trading contracts look at.
+
+class TradeCase():
+
+    def __init__(self, orderType, outcome, amount, price, fillAmount, creatorLong, creatorShort, fillerLong, fillerShort, numOutcomes, numTicks, creatorFeeDivisor, reportingFeeDivisor):
+        self.orderType = orderType
+        self.outcome = outcome
+        self.amount = amount
+        self.price = price
+        self.fillAmount = fillAmount
+        self.creatorLong = creatorLong
+        self.creatorShort = creatorShort
+        self.fillerLong = fillerLong
+        self.fillerShort = fillerShort
+        self.numOutcomes = numOutcomes
+        self.numTicks = numTicks
+        self.creatorFeeDivisor = creatorFeeDivisor
+        self.reportingFeeDivisor = reportingFeeDivisor
+
+    def __repr__(self):
+        return 'TradeCase(%s)' % ', '.join('%s=%r' % (key, value) for key, value in sorted(vars(self).items()))
+
+# What a fill leaves behind. Token amounts are what each participant gets back in ETH, the filler's tokensIn is what it has to send along with the fill.
+class Settlement():
+
+    def __init__(self):
+        self.sharesEscrowed = 0
+        self.moneyEscrowed = 0
+        self.creatorLong = 0
+        self.creatorShort = 0
+        self.fillerLong = 0
+        self.fillerShort = 0
+        self.creatorTokens = 0
+        self.fillerTokensIn = 0
+        self.fillerTokensOut = 0
+        self.creatorFees = 0
+        self.reporterFees = 0
+        self.openInterestDelta = 0
+        self.completeSetsSold = 0
+        self.completeSetsBought = 0
+        self.remaining = 0
+        self.filled = 0
+        self.orderAmount = 0
+        self.orderMoneyEscrowed = 0
+        self.orderSharesEscrowed = 0
+        self.payoutRemainder = 0
+        self.reverts = False
+
+# Order.escrowFundsForBid and Order.escrowFundsForAsk: shares the creator already holds cover the order before any money does
+def escrowOrder(case):
+    if case.orderType == BID:
+        sharesEscrowed = min(case.creatorShort, case.amount)
+        return sharesEscrowed, (case.amount - sharesEscrowed) * case.price
+    sharesEscrowed = min(case.creatorLong, case.amount)
+    return sharesEscrowed, (case.amount - sharesEscrowed) * (case.numTicks - case.price)
+
+def settleTrade(case):
+    settlement = Settlement()
+    numTicks = case.numTicks
+    priceLong = case.price
+    priceShort = numTicks - case.price
+    creatorIsLong = case.orderType == BID
+    creatorPrice = priceLong if creatorIsLong else priceShort
+    fillerPrice = priceShort if creatorIsLong else priceLong
+
+    sharesEscrowed, moneyEscrowed = escrowOrder(case)
+    settlement.sharesEscrowed = sharesEscrowed
+    settlement.moneyEscrowed = moneyEscrowed
+    creatorLong = case.creatorLong - (0 if creatorIsLong else sharesEscrowed)
+    creatorShort = case.creatorShort - (sharesEscrowed if creatorIsLong else 0)
+    fillerLong = case.fillerLong
+    fillerShort = case.fillerShort
+
+    # Trade.getMaker and Trade.getFiller
+    creatorSell = sharesEscrowed
+    creatorBuy = case.amount - sharesEscrowed
+    fillerSell = min(fillerLong if creatorIsLong else fillerShort, case.fillAmount)
+    fillerBuy = case.fillAmount - fillerSell
+    startingCreatorSell = creatorSell
+    startingCreatorBuy = creatorBuy
+
+    # tradeMakerSharesForFillerShares: the shares of both add up to complete sets, which are sold with fees and the proceeds split by price
+    completeSets = min(creatorSell, fillerSell)
+    if completeSets:
+        payout = completeSets * numTicks
+        settlement.creatorFees = payout // case.creatorFeeDivisor if case.creatorFeeDivisor else 0
+        settlement.reporterFees = payout // case.reportingFeeDivisor
+        payout -= settlement.creatorFees + settlement.reporterFees
+        longShare = payout * priceLong // numTicks
+        settlement.payoutRemainder = payout * priceLong % numTicks
+        if creatorIsLong:
+            settlement.creatorTokens += payout - longShare
+            settlement.fillerTokensOut += longShare
+            fillerLong -= completeSets
+        else:
+            settlement.creatorTokens += longShare
+            settlement.fillerTokensOut += payout - longShare
+            fillerShort -= completeSets
+        settlement.openInterestDelta -= completeSets * numTicks
+        settlement.completeSetsSold = completeSets
+        creatorSell -= completeSets
+        fillerSell -= completeSets
+
+    # tradeMakerSharesForFillerTokens: the escrowed shares go to the filler, who pays the creator for them
+    traded = min(creatorSell, fillerBuy)
+    if traded:
+        if creatorIsLong:
+            fillerShort += traded
+        else:
+            fillerLong += traded
+        settlement.fillerTokensIn += traded * fillerPrice
+        settlement.creatorTokens += traded * fillerPrice
+        creatorSell -= traded
+        fillerBuy -= traded
+
+    # tradeMakerTokensForFillerShares: the filler's shares go to the creator, who pays with the escrowed money
+    traded = min(fillerSell, creatorBuy)
+    if traded:
+        if creatorIsLong:
+            fillerLong -= traded
+            creatorLong += traded
+        else:
+            fillerShort -= traded
+            creatorShort += traded
+        settlement.fillerTokensOut += traded * creatorPrice
+        creatorBuy -= traded
+        fillerSell -= traded
+
+    # tradeMakerTokensForFillerTokens: the escrowed money and the filler's money buy new complete sets
+    completeSets = min(creatorBuy, fillerBuy)
+    if completeSets:
+        settlement.fillerTokensIn += completeSets * fillerPrice
+        if creatorIsLong:
+            creatorLong += completeSets
+            fillerShort += completeSets
+        else:
+            fillerLong += completeSets
+            creatorShort += completeSets
+        settlement.openInterestDelta += completeSets * numTicks
+        settlement.completeSetsBought = completeSets
+        creatorBuy -= completeSets
+        fillerBuy -= completeSets
+
+    settlement.creatorLong = creatorLong
+    settlement.creatorShort = creatorShort
+    settlement.fillerLong = fillerLong
+    settlement.fillerShort = fillerShort
+    settlement.remaining = fillerSell + fillerBuy
+    settlement.filled = case.fillAmount - settlement.remaining
+
+    # Orders.recordFillOrder
+    sharesFilled = startingCreatorSell - creatorSell
+    tokensFilled = (startingCreatorBuy - creatorBuy) * creatorPrice
+    fill = sharesFilled + tokensFilled // creatorPrice
+    if fill > case.amount:
+        settlement.reverts = True
+        return settlement
+    settlement.orderAmount = case.amount - fill
+    settlement.orderMoneyEscrowed = moneyEscrowed - tokensFilled
+    settlement.orderSharesEscrowed = sharesEscrowed - sharesFilled
+    if settlement.orderAmount == 0:
+        if settlement.orderMoneyEscrowed != 0:
+            settlement.reverts = True
+        # a filled order is removed, so there is nothing left to read back
+        settlement.orderSharesEscrowed = 0
+    return settlement
+
+# Properties any settlement has to have no matter how the contracts split it up. Returns the names of the ones that don't hold.
+def checkSettlement(case, settlement):
+    if settlement.reverts: return []
+    violations = []
+    # every wei that left a participant is in the market, with the creator or with a fee recipient
+    marketDelta = settlement.orderMoneyEscrowed + settlement.openInterestDelta
+    participantDelta = settlement.creatorTokens - settlement.moneyEscrowed + settlement.fillerTokensOut - settlement.fillerTokensIn
+    if participantDelta + settlement.creatorFees + settlement.reporterFees + marketDelta != 0:
+        violations.append('tokensConserved')
+    # shares only appear or disappear as whole complete sets
+    setsDelta = settlement.completeSetsBought - settlement.completeSetsSold
+    escrowedLong = 0 if case.orderType == BID else settlement.orderSharesEscrowed
+    escrowedShort = settlement.orderSharesEscrowed if case.orderType == BID else 0
+    if settlement.creatorLong + settlement.fillerLong + escrowedLong - case.creatorLong - case.fillerLong != setsDelta:
+        violations.append('longSharesConserved')
+    if settlement.creatorShort + settlement.fillerShort + escrowedShort - case.creatorShort - case.fillerShort != setsDelta:
+        violations.append('shortSharesConserved')
+    if settlement.filled > case.amount or settlement.filled + settlement.remaining != case.fillAmount:
+        violations.append('fillAmount')
+    if case.amount - settlement.orderAmount != settlement.filled:
+        violations.append('orderAmount')
+    # the creator ends up with exactly the position it asked for, counting the shares still in escrow, and the filler with the opposite one
+    direction = 1 if case.orderType == BID else -1
+    creatorPositionDelta = (settlement.creatorLong - settlement.creatorShort - direction * settlement.orderSharesEscrowed) - (case.creatorLong - case.creatorShort)
+    if creatorPositionDelta != direction * settlement.filled:
+        violations.append('creatorPosition')
+    fillerPositionDelta = (settlement.fillerLong - settlement.fillerShort) - (case.fillerLong - case.fillerShort)
+    if fillerPositionDelta != -direction * settlement.filled:
+        violations.append('fillerPosition')
+    # nobody pays more than the price of the shares they get
+    fillerPrice = case.numTicks - case.price if case.orderType == BID else case.price
+    if settlement.fillerTokensIn > settlement.filled * fillerPrice:
+        violations.append('fillerOverpays')
+    if min(settlement.creatorLong, settlement.creatorShort, settlement.fillerLong, settlement.fillerShort, settlement.orderMoneyEscrowed, settlement.orderSharesEscrowed) < 0:
+        violations.append('negativeBalance')
+    return violations
+
+# Conditions where rounding, zero amounts or several settlement paths in one fill make a disagreement with the contracts most likely
+def getEdgeConditions(case, settlement):
+    conditions = []
+    if case.price == 1 or case.price == case.numTicks - 1:
+        conditions.append('priceAtBound')
+    if case.amount < case.numTicks or case.fillAmount < case.numTicks:
+        conditions.append('dustAmount')
+    if settlement.reverts:
+        conditions.append('reverts')
+        return conditions
+    if settlement.payoutRemainder:
+        conditions.append('payoutRounding')
+    if settlement.completeSetsSold and (settlement.reporterFees == 0 or (case.creatorFeeDivisor and settlement.creatorFees == 0)):
+        conditions.append('feeRoundsToZero')
+    if settlement.sharesEscrowed and settlement.moneyEscrowed:
+        conditions.append('mixedEscrow')
+    fillerSharesSold = min(case.fillerLong if case.orderType == BID else case.fillerShort, case.fillAmount)
+    if fillerSharesSold and fillerSharesSold < case.fillAmount:
+        conditions.append('mixedFilling')
+    if settlement.completeSetsSold and settlement.completeSetsBought:
+        conditions.append('setsSoldAndBought')
+    if settlement.orderAmount:
+        conditions.append('partialFill')
+    if settlement.remaining:
+        conditions.append('overfill')
+    return conditions
+
+def generateAmount(random, numTicks, maxAmount):
+    kind = random.randrange(4)
+    if kind == 0:
+        return random.randint(1, 10)
+    if kind == 1:
+        return random.randint(1, min(numTicks, maxAmount))
+    if kind == 2:
+        return min(maxAmount, random.randint(1, 100) * 10**random.randint(0, 15))
+    return random.randint(1, maxAmount)
+
+def generateHolding(random, amount):
+    kind = random.randrange(4)
+    if kind < 2:
+        return 0
+    if kind == 2:
+        return amount
+    return random.randint(1, 2 * amount)
+
+def generateCase(random, numOutcomes, numTicks, creatorFeeDivisor, reportingFeeDivisor, maxAmount):
+    amount = generateAmount(random, numTicks, maxAmount)
+    fillKind = random.randrange(3)
+    fillAmount = amount if fillKind == 0 else random.randint(1, amount) if fillKind == 1 else amount + generateAmount(random, numTicks, maxAmount)
+    price = random.choice([1, numTicks - 1]) if random.random() < 0.1 else random.randint(1, numTicks - 1)
+    return TradeCase(random.choice([BID, ASK]), random.randrange(numOutcomes), amount, price, fillAmount, generateHolding(random, amount), generateHolding(random, amount), generateHolding(random, fillAmount), generateHolding(random, fillAmount), numOutcomes, numTicks, creatorFeeDivisor, reportingFeeDivisor)
+
+# Picks the cases worth replaying on chain: every case breaking an invariant, the first case of every combination of edge conditions, rarest combination first, and a random sample of the rest. Returns (case, settlement, reason) tuples in that order.
+def selectReplays(cases, random, sampleRate, limit):
+    violating = []
+    firstCases = {}
+    counts = {}
+    sampled = []
+    for case in cases:
+        settlement = settleTrade(case)
+        violations = checkSettlement(case, settlement)
+        conditions = frozenset(getEdgeConditions(case, settlement))
+        counts[conditions] = counts.get(conditions, 0) + 1
+        if violations:
+            violating.append((case, settlement, 'violates %s' % ', '.join(violations)))
+        elif conditions not in firstCases:
+            firstCases[conditions] = (case, settlement, 'edge %s' % (', '.join(sorted(conditions)) or 'none'))
+        elif random.random() < sampleRate:
+            sampled.append((case, settlement, 'sampled'))
+    edgeCases = [firstCases[conditions] for conditions in sorted(firstCases, key=lambda conditions: (counts[conditions], sorted(conditions)))]
+    return (violating + edgeCases + sampled)[:limit]
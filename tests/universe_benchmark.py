@@ -0,0 +1,133 @@
+#!/usr/bin/env python
+
+from collections import OrderedDict, defaultdict
+from csv import writer as csv_writer
+from datetime import timedelta
+from ethereum.tools import tester
+from time import time
+
+CSV_COLUMNS = ['operation', 'window', 'markets', 'feeWindows', 'gas', 'seconds']
+# Column headings of the summary table for every operation
+SUMMARY_OPERATIONS = OrderedDict([
+    ('getOrCacheReportingFeeDivisor (new window)', 'divisor new'),
+    ('getOrCacheReportingFeeDivisor (cached)', 'divisor hit'),
+    ('getOrCacheMarketCreationCost', 'creation cost'),
+    ('createYesNoMarket', 'create market'),
+    ('doInitialReport', 'report'),
+    ('finalize', 'finalize'),
+    ('redeemStake', 'redeemStake'),
+])
+
+class Measurement():
+
+    def __init__(self, operation, window, markets, feeWindows, gas, seconds):
+        self.operation = operation
+        self.window = window
+        self.markets = markets
+        self.feeWindows = feeWindows
+        self.gas = gas
+        self.seconds = seconds
+
+# Fills a universe with markets over many fee windows to see how the per window caches of the universe and the growing number of markets and fee windows affect gas and wall time. Every window creates its markets, reports on them a day later and finalizes and redeems the markets reported two windows before, whose fee window is over by then. Every measurement is recorded with the number of markets and fee windows the benchmark had added to the universe before it. Fee windows are counted from the FeeWindowCreated events of the universe, since the universe creates a fee window whenever a call first needs it, so their number doesn't follow the window the benchmark is in.
+class UniverseBenchmark():
+
+    def __init__(self, fixture, universe, cash, windows, marketsPerWindow):
+        self.fixture = fixture
+        self.universe = universe
+        self.cash = cash
+        self.windows = windows
+        self.marketsPerWindow = marketsPerWindow
+        self.measurements = []
+        self.markets = 0
+        self.feeWindowEvents = []
+        self.window = 0
+
+    def measure(self, operation, transaction):
+        feeWindows = self.getFeeWindowCount()
+        startingGas = self.fixture.chain.head_state.gas_used
+        startTime = time()
+        result = transaction()
+        elapsed = time() - startTime
+        self.measurements.append(Measurement(operation, self.window, self.markets, feeWindows, self.fixture.chain.head_state.gas_used - startingGas, elapsed))
+        return result
+
+    def getFeeWindowCount(self):
+        return len([event for event in self.feeWindowEvents if event['universe'] == self.universe.address])
+
+    def run(self):
+        with self.fixture.getEventBus().subscribe(self.fixture.contracts['Augur'], 'FeeWindowCreated', self.feeWindowEvents):
+            self.runWindows()
+
+    def runWindows(self):
+        timeContract = self.fixture.contracts['Time']
+        reportedMarkets = []
+        for window in range(self.windows):
+            self.window = window
+            # the first call in a window works out the divisor and caches it for the rest of the window
+            self.measure('getOrCacheReportingFeeDivisor (new window)', lambda: self.universe.getOrCacheReportingFeeDivisor())
+            self.measure('getOrCacheReportingFeeDivisor (cached)', lambda: self.universe.getOrCacheReportingFeeDivisor())
+            markets = self.createMarkets()
+            # markets reported two windows ago are in the fee window that just ended
+            if len(reportedMarkets) > 1:
+                self.finalizeAndRedeem(reportedMarkets.pop(0))
+            timeContract.setTimestamp(max(market.getEndTime() for market in markets) + 1)
+            self.reportMarkets(markets)
+            reportedMarkets.append(markets)
+            feeWindow = self.fixture.applySignature('FeeWindow', self.universe.getOrCreateCurrentFeeWindow())
+            timeContract.setTimestamp(feeWindow.getEndTime() + 1)
+        self.window = self.windows
+        # the markets reported in the last windows still need their fee windows to end
+        for markets in reportedMarkets:
+            feeWindow = self.fixture.applySignature('FeeWindow', markets[0].getFeeWindow())
+            timeContract.setTimestamp(max(timeContract.getTimestamp(), feeWindow.getEndTime() + 1))
+            self.finalizeAndRedeem(markets)
+
+    def createMarkets(self):
+        marketCreationCost = self.measure('getOrCacheMarketCreationCost', lambda: self.universe.getOrCacheMarketCreationCost())
+        endTime = long(self.fixture.contracts['Time'].getTimestamp() + timedelta(days=1).total_seconds())
+        markets = []
+        for _ in range(self.marketsPerWindow):
+            marketAddress = self.measure('createYesNoMarket', lambda: self.universe.createYesNoMarket(endTime, 10**16, self.cash.address, tester.a0, "", "description", "", value=marketCreationCost))
+            markets.append(self.fixture.applySignature('Market', marketAddress))
+            self.markets += 1
+        return markets
+
+    def reportMarkets(self, markets):
+        for market in markets:
+            self.measure('doInitialReport', lambda: market.doInitialReport([0, market.getNumTicks()], False))
+
+    def finalizeAndRedeem(self, markets):
+        for market in markets:
+            self.measure('finalize', lambda: market.finalize())
+        for market in markets:
+            self.measure('redeemStake', lambda: self.universe.redeemStake([market.getInitialReporter()], [market.getFeeWindow()]))
+
+    def getMeanGasByWindow(self):
+        gas = defaultdict(lambda: defaultdict(list))
+        for measurement in self.measurements:
+            gas[measurement.window][measurement.operation].append(measurement.gas)
+        return OrderedDict((window, dict((operation, sum(values) // len(values)) for operation, values in gas[window].items())) for window in sorted(gas))
+
+    def formatReport(self):
+        markets = dict((measurement.window, measurement.markets) for measurement in self.measurements)
+        lines = ['%-8s %8s  %s' % ('window', 'markets', ' '.join('%13s' % heading for heading in SUMMARY_OPERATIONS.values()))]
+        for window, gas in self.getMeanGasByWindow().items():
+            lines.append('%-8s %8d  %s' % (window, markets[window], ' '.join('%13s' % (gas[operation] if operation in gas else '-') for operation in SUMMARY_OPERATIONS)))
+        seconds = defaultdict(float)
+        counts = defaultdict(int)
+        for measurement in self.measurements:
+            seconds[measurement.operation] += measurement.seconds
+            counts[measurement.operation] += 1
+        lines.append('')
+        lines.append('%-45s %8s %12s' % ('operation', 'count', 'ms per tx'))
+        for operation in SUMMARY_OPERATIONS:
+            if counts[operation]:
+                lines.append('%-45s %8d %12.2f' % (operation, counts[operation], 1000 * seconds[operation] / counts[operation]))
+        return lines
+
+    def writeCsv(self, outputPath):
+        with open(outputPath, 'wb') as file:
+            output = csv_writer(file)
+            output.writerow(CSV_COLUMNS)
+            for measurement in self.measurements:
+                output.writerow([getattr(measurement, column) for column in CSV_COLUMNS])
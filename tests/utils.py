@@ -3,6 +3,8 @@
 from json import loads
 from decimal import Decimal
 from struct import pack
+from gas_profiler import GasProfiler
+from event_bus import EventBus
 
 garbageAddress = '0xdefec8eddefec8eddefec8eddefec8eddefec8ed'
 garbageBytes20 = str(bytearray.fromhex('baadf00dbaadf00dbaadf00dbaadf00dbaadf00d'))
@@ -32,12 +34,9 @@ def bytesToLong(value):
 def bytesToHexString(value):
     return longToHexString(bytesToLong(value))
 
+# Collects the events the contract's ABI can decode into logs until the returned subscription is unsubscribed or the chain is reset
 def captureFilteredLogs(state, contract, logs):
-    def captureLog(contract, logs, message):
-        translated = contract.translator.listen(message)
-        if not translated: return
-        logs.append(translated)
-    state.log_listeners.append(lambda x: captureLog(contract, logs, x))
+    return EventBus.forState(state).subscribe(contract, events=logs)
 
 class TokenDelta():
 
@@ -85,11 +84,18 @@ class PrintGasUsed():
         self.fixture = fixture
         self.action = action
         self.originalGas = originalGas
+        self.profiler = None
 
     def __enter__(self):
+        # With --profileGas every block also gets a call tree showing which contract and function the gas went to
+        if self.fixture.profileGas:
+            self.profiler = GasProfiler(self.fixture, self.action, self.originalGas)
+            self.profiler.__enter__()
         self.startingGas = self.fixture.chain.head_state.gas_used
 
     def __exit__(self, *args):
+        if self.profiler:
+            return self.profiler.__exit__(*args)
         if args[1]:
             raise args[1]
         gasUsed = self.fixture.chain.head_state.gas_used - self.startingGas
@@ -98,6 +104,18 @@ class PrintGasUsed():
         else:
             print "GAS USED WITH %s : %i" % (self.action, gasUsed)
 
+# A PrintGasUsed block whose gas is checked against the recorded baseline of the scenario when running with --gasBench
+class GasBenchmark(PrintGasUsed):
+
+    def __init__(self, fixture, scenario):
+        self.gasBaseline = fixture.gasBaseline
+        PrintGasUsed.__init__(self, fixture, scenario, self.gasBaseline.getGas(scenario) if self.gasBaseline else 0)
+
+    def __exit__(self, *args):
+        PrintGasUsed.__exit__(self, *args)
+        if self.gasBaseline:
+            self.gasBaseline.check(self.action, self.fixture.chain.head_state.gas_used - self.startingGas)
+
 class AssertLog():
 
     def __init__(self, fixture, eventName, data, skip=0, contract=None):
@@ -111,24 +129,24 @@ class AssertLog():
         self.logs = []
 
     def __enter__(self):
-        captureFilteredLogs(self.fixture.chain.head_state, self.contract, self.logs)
+        self.subscription = self.fixture.getEventBus().subscribe(self.contract, self.eventName, self.logs)
 
     def __exit__(self, *args):
+        self.subscription.unsubscribe()
         if args[1]:
             raise args[1]
 
         foundLog = None
         for log in self.logs:
-            if (log["_event_type"] == self.eventName):
-                if (self.skip == 0):
-                    foundLog = log
-                    break
-                else:
-                    self.skip -= 1
+            if (self.skip == 0):
+                foundLog = log
+                break
+            else:
+                self.skip -= 1
 
         if not foundLog:
             raise Exception("Assert log failed to find the log with event name %s" % (self.eventName))
 
         for (key, expectedValue) in self.data.items():
-            actualValue = log.get(key)
+            actualValue = foundLog.get(key)
             assert actualValue == expectedValue, "%s Log had incorrect value for key \"%s\". Expected: %s. Actual: %s" % (self.eventName, key, expectedValue, actualValue)
\ No newline at end of file
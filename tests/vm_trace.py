@@ -0,0 +1,75 @@
+#!/usr/bin/env python
+
+from logging import Handler
+from ethereum import messages, vm
+from ethereum.slogging import TRACE
+
+# Finds the artifact a piece of code was compiled from. Runtime code is matched exactly and init code by prefix since constructor arguments are appended to it. Artifacts are loaded as contracts get uploaded, so new ones are picked up whenever an unknown piece of code shows up.
+class CodeIndex():
+
+    def __init__(self, artifacts):
+        self.artifacts = artifacts
+        self.indexedArtifacts = 0
+        self.deployedCodes = {}
+        self.initCodes = []
+        self.lookups = {}
+
+    def indexArtifacts(self):
+        if self.indexedArtifacts == len(self.artifacts): return
+        for name, artifact in self.artifacts.items():
+            if not artifact['bytecode']: continue
+            self.deployedCodes[str(bytearray.fromhex(artifact['deployedBytecode']))] = name
+            self.initCodes.append((str(bytearray.fromhex(artifact['bytecode'])), name))
+        self.indexedArtifacts = len(self.artifacts)
+
+    # Returns the artifact name and whether the code is its constructor, or (None, False) for code we didn't compile
+    def lookup(self, code):
+        if code in self.lookups:
+            return self.lookups[code]
+        self.indexArtifacts()
+        result = (None, False)
+        if code in self.deployedCodes:
+            result = (self.deployedCodes[code], False)
+        else:
+            for initCode, name in self.initCodes:
+                if code.startswith(initCode):
+                    result = (name, True)
+                    break
+        self.lookups[code] = result
+        return result
+
+def skipVmTrace(ext, msg, compustate, opcode, pushcache, tracer=None):
+    pass
+
+class VmTraceHandler(Handler):
+
+    def __init__(self, tracer):
+        Handler.__init__(self, TRACE)
+        self.tracer = tracer
+
+    def emit(self, record):
+        self.tracer.onOperation(record.kwargs)
+
+# Base for profilers that need to see every instruction. pyethereum only reports single instructions through its trace logger, so this turns that logger on and also wraps message execution so subclasses know which frame an instruction belongs to. Subclasses implement applyMsg(ext, msg, code), which has to call self.originalApplyMsg, and onOperation(operation), which is called once per instruction before it runs.
+class VmTracer():
+
+    def start(self):
+        self.originalApplyMsg = messages._apply_msg
+        messages._apply_msg = self.applyMsg
+        # with tracing on, pyethereum 2.1 logs every instruction a second time through vm_trace after it ran, with the same stack and program counter, and prints the push cache on every PUSH while doing so
+        self.originalVmTrace = vm.vm_trace
+        vm.vm_trace = skipVmTrace
+        self.handler = VmTraceHandler(self)
+        self.originalLevel = vm.log_vm_op.level
+        self.originalPropagate = vm.log_vm_op.propagate
+        vm.log_vm_op.setLevel(TRACE)
+        # the trace records are for us, not for whatever handlers the root logger has
+        vm.log_vm_op.propagate = False
+        vm.log_vm_op.addHandler(self.handler)
+
+    def stop(self):
+        messages._apply_msg = self.originalApplyMsg
+        vm.vm_trace = self.originalVmTrace
+        vm.log_vm_op.removeHandler(self.handler)
+        vm.log_vm_op.setLevel(self.originalLevel)
+        vm.log_vm_op.propagate = self.originalPropagate